@@ -8,6 +8,7 @@ from theatre_booking.models import (
     Play,
     Performance,
     Ticket,
+    SeatHold,
 )
 
 
@@ -15,10 +16,18 @@ class TicketInline(admin.TabularInline):
     model = Ticket
     extra = 1
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == "performance":
+            # Ticket.clean() reads the hall of every submitted ticket.
+            kwargs["queryset"] = Performance.objects.select_related("theatre_hall")
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
 
 @admin.register(Reservation)
 class ReservationAdmin(admin.ModelAdmin):
     inlines = (TicketInline,)
+    list_display = ("id", "user", "status", "created_at")
+    list_filter = ("status",)
 
 
 admin.site.register(Actor)
@@ -27,3 +36,4 @@ admin.site.register(TheatreHall)
 admin.site.register(Play)
 admin.site.register(Performance)
 admin.site.register(Ticket)
+admin.site.register(SeatHold)
@@ -0,0 +1,196 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from theatre_booking.booking import SeatsUnavailable, book_seats
+from theatre_booking.models import Performance, SeatHold
+from theatre_booking.seat_map import build_seat_map, get_seat_map
+from theatre_service.transactions import contended_write
+
+
+class NoAdjacentSeats(Exception):
+    def __init__(self, count):
+        super().__init__(f"No {count} free seats together")
+        self.count = count
+
+
+def allocation_settings():
+    return settings.SEAT_ALLOCATION
+
+
+class SeatAllocator:
+    """Pick the best free block of seats of one performance.
+
+    Rows are numbered from the stage. A block is scored by how far its
+    middle is from the centre of the row and how far its row is from the
+    ideal row, each scaled to 0..1 and weighted by ``SEAT_ALLOCATION``;
+    the lowest score wins. When no row has enough free seats in a run,
+    the request is split over two adjacent rows.
+
+    Each row is an integer with one bit per free seat, seat 1 in the most
+    significant of the row's bits, so runs of free seats are found with a
+    few shifts and ANDs per row instead of a loop over the seats.
+    """
+
+    def __init__(self, seat_map, blocked=()):
+        options = allocation_settings()
+        self.rows = seat_map.rows
+        self.width = seat_map.seats_in_row
+        self.centre_weight = options["CENTRE_WEIGHT"] / max((self.width - 1) / 2, 1)
+        ideal_row = 1 + options["IDEAL_ROW"] * (self.rows - 1)
+        row_weight = options["ROW_WEIGHT"] / max(self.rows - 1, 1)
+        # Row scores by row number; row 0 does not exist.
+        self.row_scores = [0.0] + [
+            row_weight * abs(row - ideal_row) for row in range(1, self.rows + 1)
+        ]
+        self.free = [0] + self.free_rows(seat_map, blocked)
+        self.starts = [[free] for free in self.free]
+        self.best = {}
+
+    def free_rows(self, seat_map, blocked):
+        """Return the free-seat bitmask of every row, front row first."""
+        width = self.width
+        total = len(seat_map.bits) * 8
+        taken = int.from_bytes(seat_map.bits, "big")
+        for row, seat in blocked:
+            if 1 <= row <= self.rows and 1 <= seat <= width:
+                taken |= 1 << (total - (row - 1) * width - seat)
+        row_mask = (1 << width) - 1
+        return [
+            ~(taken >> (total - row * width)) & row_mask
+            for row in range(1, self.rows + 1)
+        ]
+
+    def block_starts(self, row, count):
+        """Bitmask with bit q set when bits q .. q + count - 1 are all free.
+
+        Such a block starts at seat ``width - q - count + 1``. The masks of
+        a row are built up one block size at a time and kept.
+        """
+        masks = self.starts[row]
+        free = masks[0]
+        while len(masks) < count and masks[-1]:
+            masks.append(masks[-1] & (free >> len(masks)))
+        return masks[count - 1] if len(masks) >= count else 0
+
+    def best_in_row(self, row, count):
+        """Return ``(score, first seat)`` of the best block in a row, or None."""
+        key = (row, count)
+        if key in self.best:
+            return self.best[key]
+        found = None
+        starts = self.block_starts(row, count)
+        if starts:
+            # Lowest bit of a block whose middle is on the centre of the row
+            ideal = (self.width - count) / 2
+            below = int(ideal)
+            position = None
+            lower = starts & ((2 << below) - 1)
+            if lower:
+                position = lower.bit_length() - 1
+            upper = starts >> (below + 1)
+            if upper:
+                above = below + (upper & -upper).bit_length()
+                if position is None or above - ideal < ideal - position:
+                    position = above
+            score = self.centre_weight * abs(position - ideal) + self.row_scores[row]
+            found = (score, self.width - position - count + 1)
+        self.best[key] = found
+        return found
+
+    def allocate(self, count):
+        """Return the best ``count`` seats as ``(row, seat)`` pairs, or None."""
+        if count > self.width:
+            return None
+        best = None
+        for row in sorted(range(1, self.rows + 1), key=self.row_scores.__getitem__):
+            if best is not None and self.row_scores[row] >= best[0]:
+                # Later rows cannot beat the best block even at the centre.
+                break
+            found = self.best_in_row(row, count)
+            if found is not None and (best is None or found[0] < best[0]):
+                best = (found[0], [(row, found[1], count)])
+        if best is None:
+            best = self.allocate_split(count)
+        if best is None:
+            return None
+        return [
+            (row, seat)
+            for row, first, size in best[1]
+            for seat in range(first, first + size)
+        ]
+
+    def allocate_split(self, count):
+        """Best split of ``count`` seats over two adjacent rows, or None."""
+        # A pair scores at least the better of its two rows' scores.
+        bounds = {
+            row: min(self.row_scores[row], self.row_scores[row + 1])
+            for row in range(1, self.rows)
+        }
+        best = None
+        for row in sorted(bounds, key=bounds.__getitem__):
+            if best is not None and bounds[row] >= best[0]:
+                break
+            for front in range(count - 1, 0, -1):
+                first = self.best_in_row(row, front)
+                if first is None:
+                    continue
+                second = self.best_in_row(row + 1, count - front)
+                if second is None:
+                    continue
+                score = (first[0] * front + second[0] * (count - front)) / count
+                if best is None or score < best[0]:
+                    best = (
+                        score,
+                        [(row, first[1], front), (row + 1, second[1], count - front)],
+                    )
+        return best
+
+
+def blocked_seats(performance, user):
+    """Seats held by other customers, which the allocator must skip."""
+    return (
+        SeatHold.objects.filter(performance=performance, expires_at__gt=timezone.now())
+        .exclude(user=user)
+        .values_list("row", "seat")
+    )
+
+
+def lock_performance(performance):
+    """Serialise seat allocation for a performance until the transaction ends.
+
+    A no-op UPDATE of the performance row takes its row lock, or the write
+    lock of the whole database on SQLite.
+    """
+    Performance.objects.filter(pk=performance.pk).update(tickets_sold=F("tickets_sold"))
+
+
+@contended_write
+def allocate_seats(user, performance, count):
+    """Book the best ``count`` free seats of a performance for ``user``.
+
+    Seats are first picked from the cached seat map and booked
+    optimistically. If a concurrent booking took any of them, the pick is
+    made again from the tickets in the database while holding the
+    performance's lock, so the second attempt cannot conflict. Returns the
+    reservation.
+    """
+    seat_map = get_seat_map(performance)
+    seats = SeatAllocator(seat_map, blocked_seats(performance, user)).allocate(count)
+    if seats is None:
+        raise NoAdjacentSeats(count)
+    try:
+        return book_seats(user, performance, seats)
+    except SeatsUnavailable:
+        pass
+
+    with transaction.atomic():
+        lock_performance(performance)
+        seat_map = build_seat_map(performance)
+        seats = SeatAllocator(seat_map, blocked_seats(performance, user)).allocate(
+            count
+        )
+        if seats is None:
+            raise NoAdjacentSeats(count)
+        return book_seats(user, performance, seats)
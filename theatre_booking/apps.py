@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TheatreBookingConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "theatre_booking"
+
+    def ready(self):
+        import theatre_booking.signals  # noqa: F401
@@ -0,0 +1,212 @@
+import base64
+import binascii
+import json
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from theatre_booking.events import RESYNC, get_broadcaster, snapshot_event
+from theatre_booking.models import Performance
+from theatre_booking.pagination import PerformanceCursorPagination
+from theatre_booking.seat_map import aget_seat_map
+from theatre_booking.serializers import (
+    PerformanceDetailSerializer,
+    PerformanceFilterSerializer,
+    PerformanceListSerializer,
+)
+from theatre_booking.views import performance_filter_lookups, with_availability
+from theatre_service.renderers import OrjsonRenderer
+
+
+def json_response(data, status=200, headers=None):
+    return HttpResponse(
+        OrjsonRenderer().render(data),
+        status=status,
+        content_type="application/json",
+        headers=headers,
+    )
+
+
+def check_request(request):
+    """Apply the project's DRF authentication, permissions and throttles.
+
+    Returns an error response, or ``None`` when the request may proceed.
+    """
+    drf_request = Request(
+        request,
+        authenticators=[
+            authentication()
+            for authentication in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+        ],
+    )
+    try:
+        for permission in api_settings.DEFAULT_PERMISSION_CLASSES:
+            if permission().has_permission(drf_request, None):
+                continue
+            if drf_request.authenticators and not drf_request.successful_authenticator:
+                raise exceptions.NotAuthenticated()
+            raise exceptions.PermissionDenied()
+        for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES:
+            throttle = throttle_class()
+            if not throttle.allow_request(drf_request, None):
+                raise exceptions.Throttled(throttle.wait())
+    except exceptions.APIException as error:
+        headers = {}
+        if isinstance(
+            error, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)
+        ):
+            authenticate_header = drf_request.authenticators[0].authenticate_header(
+                drf_request
+            )
+            if authenticate_header:
+                headers["WWW-Authenticate"] = authenticate_header
+            else:
+                error.status_code = exceptions.PermissionDenied.status_code
+        wait = getattr(error, "wait", None)
+        if wait is not None:
+            headers["Retry-After"] = str(int(wait))
+        return json_response(
+            {"detail": error.detail}, status=error.status_code, headers=headers
+        )
+    return None
+
+
+def encode_cursor(performance):
+    position = f"{performance.showtime.isoformat()}|{performance.id}"
+    return base64.urlsafe_b64encode(position.encode()).decode("ascii")
+
+
+def decode_cursor(cursor):
+    try:
+        showtime, pk = base64.urlsafe_b64decode(cursor).decode().split("|")
+        return parse_datetime(showtime), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        return None
+
+
+def page_size(request):
+    try:
+        size = int(request.GET["page_size"])
+    except (KeyError, ValueError):
+        return PerformanceCursorPagination.page_size
+    return min(max(size, 1), PerformanceCursorPagination.max_page_size)
+
+
+async def performance_list(request):
+    """Async performance list, keyset paginated by ``(showtime, id)``.
+
+    Takes the same filters as the performance list of the router and, like
+    it, defaults to upcoming performances.
+    """
+    error = await sync_to_async(check_request)(request)
+    if error is not None:
+        return error
+
+    filters = PerformanceFilterSerializer(data=request.GET)
+    if not filters.is_valid():
+        return json_response(filters.errors, status=400)
+    lookups = performance_filter_lookups(filters.validated_data)
+    if not ("showtime__gte" in lookups or "showtime__lte" in lookups):
+        lookups["showtime__gte"] = timezone.now()
+
+    queryset = (
+        with_availability(Performance.objects.filter(**lookups))
+        .select_related("play")
+        .prefetch_related("play__actors", "play__genres")
+        .order_by("showtime", "id")
+    )
+    if "cursor" in request.GET:
+        position = decode_cursor(request.GET["cursor"])
+        if position is None or position[0] is None:
+            return json_response({"detail": "Invalid cursor"}, status=404)
+        showtime, pk = position
+        queryset = queryset.filter(
+            Q(showtime__gt=showtime) | Q(showtime=showtime, id__gt=pk)
+        )
+
+    size = page_size(request)
+    performances = [performance async for performance in queryset[: size + 1]]
+    next_url = None
+    if len(performances) > size:
+        performances = performances[:size]
+        next_url = replace_query_param(
+            request.build_absolute_uri(), "cursor", encode_cursor(performances[-1])
+        )
+    return json_response(
+        {
+            "next": next_url,
+            "results": PerformanceListSerializer(performances, many=True).data,
+        }
+    )
+
+
+async def performance_detail(request, pk):
+    error = await sync_to_async(check_request)(request)
+    if error is not None:
+        return error
+    queryset = with_availability(Performance.objects.select_related("theatre_hall"))
+    try:
+        performance = await queryset.aget(pk=pk)
+    except Performance.DoesNotExist:
+        return json_response({"detail": "No Performance matches the given query."}, 404)
+    return json_response(PerformanceDetailSerializer(performance).data)
+
+
+async def performance_seats(request, pk):
+    error = await sync_to_async(check_request)(request)
+    if error is not None:
+        return error
+    try:
+        performance = await Performance.objects.select_related("theatre_hall").aget(
+            pk=pk
+        )
+    except Performance.DoesNotExist:
+        return json_response({"detail": "No Performance matches the given query."}, 404)
+    seat_map = await aget_seat_map(performance)
+    return json_response(seat_map.to_representation())
+
+
+def sse_message(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode()
+
+
+async def performance_events(request, pk):
+    """Server-Sent Events stream of seat changes of a performance.
+
+    Starts with a full ``snapshot`` and repeats one periodically so clients
+    can resynchronise; in between, ``seats-taken`` and ``seats-released``
+    events carry the changed seats.
+    """
+    error = await sync_to_async(check_request)(request)
+    if error is not None:
+        return error
+    if not await Performance.objects.filter(pk=pk).aexists():
+        return json_response({"detail": "No Performance matches the given query."}, 404)
+
+    async def stream():
+        broadcaster = get_broadcaster()
+        # Subscribe before the first snapshot so no change falls between them.
+        queue = broadcaster.subscribe(pk)
+        try:
+            yield sse_message(await snapshot_event(pk))
+            while True:
+                event = await queue.get()
+                if event is RESYNC:
+                    event = await snapshot_event(pk)
+                yield sse_message(event)
+        except Performance.DoesNotExist:
+            pass
+        finally:
+            broadcaster.unsubscribe(pk, queue)
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
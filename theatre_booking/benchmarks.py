@@ -0,0 +1,179 @@
+import math
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+from theatre_booking.booking import recount_tickets_sold
+from theatre_booking.models import (
+    Actor,
+    Genre,
+    Performance,
+    Play,
+    Reservation,
+    TheatreHall,
+    Ticket,
+)
+
+
+@contextmanager
+def throwaway_database(alias=DEFAULT_DB_ALIAS, name=None):
+    """Run the block against a freshly migrated test database.
+
+    ``name`` overrides the test database name, e.g. to put an SQLite test
+    database in a file rather than in memory.
+    """
+    connection = connections[alias]
+    test_settings = connection.settings_dict["TEST"]
+    old_test_name = test_settings.get("NAME")
+    if name is not None:
+        test_settings["NAME"] = name
+    try:
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            yield connection
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+    finally:
+        test_settings["NAME"] = old_test_name
+
+
+def bulk_insert(model, objects, batch_size):
+    objects = iter(objects)
+    created = 0
+    while batch := list(islice(objects, batch_size)):
+        model.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[max(index, 0)]
+
+
+def seed_dataset(
+    users=10,
+    halls=10,
+    genres=20,
+    actors=500,
+    plays=200,
+    performances=2000,
+    tickets=100_000,
+    tickets_per_reservation=4,
+    batch_size=10_000,
+    seed=0,
+):
+    """Fill the database with a synthetic catalog, schedule and sales.
+
+    Performances are spread over a year either side of now; tickets fill
+    performances seat by seat, so ``tickets`` is capped by total capacity.
+    Returns the users created, the first one being staff and owning the
+    first reservation.
+    """
+    rng = random.Random(seed)
+    User = get_user_model()
+    user_objects = [
+        User(username=f"bench-user-{index}", is_staff=index == 0)
+        for index in range(users)
+    ]
+    for user in user_objects:
+        user.set_unusable_password()
+    user_objects = User.objects.bulk_create(user_objects)
+
+    genre_objects = Genre.objects.bulk_create(
+        Genre(name=f"Genre {index}") for index in range(genres)
+    )
+    actor_objects = Actor.objects.bulk_create(
+        Actor(first_name=f"First{index}", last_name=f"Last{index}")
+        for index in range(actors)
+    )
+    hall_objects = TheatreHall.objects.bulk_create(
+        TheatreHall(name=f"Hall {index}", rows=rng.randint(10, 40), seats_in_row=30)
+        for index in range(halls)
+    )
+    play_objects = Play.objects.bulk_create(
+        Play(title=f"Play {index}", description=f"Description of play {index}")
+        for index in range(plays)
+    )
+    if actor_objects:
+        bulk_insert(
+            Play.actors.through,
+            (
+                Play.actors.through(play_id=play.id, actor_id=actor.id)
+                for play in play_objects
+                for actor in rng.sample(actor_objects, min(5, len(actor_objects)))
+            ),
+            batch_size,
+        )
+    if genre_objects:
+        bulk_insert(
+            Play.genres.through,
+            (
+                Play.genres.through(play_id=play.id, genre_id=genre.id)
+                for play in play_objects
+                for genre in rng.sample(genre_objects, min(2, len(genre_objects)))
+            ),
+            batch_size,
+        )
+
+    start = timezone.now() - timedelta(days=365)
+    bulk_insert(
+        Performance,
+        (
+            Performance(
+                play=rng.choice(play_objects),
+                theatre_hall=rng.choice(hall_objects),
+                showtime=start + timedelta(minutes=rng.randrange(2 * 525_600)),
+            )
+            for _ in range(performances)
+        ),
+        batch_size,
+    )
+
+    def seats():
+        remaining = tickets
+        performance_rows = Performance.objects.values_list(
+            "id", "theatre_hall__rows", "theatre_hall__seats_in_row"
+        ).order_by("id")
+        for performance_id, rows, seats_in_row in performance_rows.iterator():
+            for row in range(1, rows + 1):
+                for seat in range(1, seats_in_row + 1):
+                    if remaining == 0:
+                        return
+                    remaining -= 1
+                    yield performance_id, row, seat
+
+    def ticket_objects():
+        reservation = None
+        for index, (performance_id, row, seat) in enumerate(seats()):
+            if index % tickets_per_reservation == 0:
+                # Reservations are created lazily so they follow ticket batches.
+                number = index // tickets_per_reservation
+                reservation = Reservation(user=user_objects[number % len(user_objects)])
+                pending_reservations.append(reservation)
+            yield Ticket(
+                row=row,
+                seat=seat,
+                performance_id=performance_id,
+                reservation=reservation,
+            )
+
+    pending_reservations = []
+    generator = ticket_objects()
+    while batch := list(islice(generator, batch_size)):
+        Reservation.objects.bulk_create(pending_reservations)
+        pending_reservations.clear()
+        Ticket.objects.bulk_create(batch)
+    recount_tickets_sold()
+
+    return user_objects
@@ -0,0 +1,282 @@
+from collections import defaultdict
+from functools import partial
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from theatre_booking.events import publish_seats
+from theatre_booking.models import (
+    Performance,
+    Reservation,
+    SeatHold,
+    Ticket,
+    seat_chunks,
+    seats_q,
+)
+from theatre_booking.performance_calendar import invalidate_performance_days
+from theatre_booking.seat_map import mark_seats
+from theatre_booking.signals import mute_ticket_signals
+from theatre_service.transactions import contended_write
+
+
+class SeatsUnavailable(Exception):
+    def __init__(self, seats):
+        super().__init__("Seats are already taken")
+        self.seats = seats
+
+
+class InvalidTransition(Exception):
+    def __init__(self, status):
+        super().__init__(f"Reservation cannot be {status}")
+        self.status = status
+
+
+def find_taken_seats(performance, seats):
+    return Ticket.taken_seats(performance, seats)
+
+
+def find_held_seats(performance, seats, user):
+    holds = SeatHold.objects.filter(
+        performance=performance, expires_at__gt=timezone.now()
+    ).exclude(user=user)
+    return sorted(
+        seat
+        for chunk in seat_chunks(seats)
+        for seat in holds.filter(seats_q(chunk)).values_list("row", "seat")
+    )
+
+
+def seats_booked(performance_id, seats):
+    mark_seats(performance_id, seats)
+    publish_seats(performance_id, seats)
+    invalidate_performance_days([performance_id])
+
+
+def seats_released(performance_id, seats):
+    mark_seats(performance_id, seats, taken=False)
+    publish_seats(performance_id, seats, taken=False)
+    invalidate_performance_days([performance_id])
+
+
+@contended_write
+def book_seats(user, performance, seats):
+    """Create one reservation with a ticket per seat, all or nothing.
+
+    Seats held by other users count as taken; the user's own holds on the
+    booked seats are consumed.
+    """
+    taken = find_taken_seats(performance, seats) or find_held_seats(
+        performance, seats, user
+    )
+    if taken:
+        raise SeatsUnavailable(taken)
+    try:
+        with transaction.atomic():
+            reservation = Reservation.objects.create(user=user)
+            Ticket.objects.bulk_create(
+                Ticket(
+                    row=row,
+                    seat=seat,
+                    performance=performance,
+                    reservation=reservation,
+                )
+                for row, seat in seats
+            )
+            Performance.adjust_tickets_sold(performance.pk, len(seats))
+            release_holds(user, performance, seats)
+            transaction.on_commit(lambda: seats_booked(performance.pk, seats))
+    except IntegrityError:
+        raise SeatsUnavailable(find_taken_seats(performance, seats))
+    return reservation
+
+
+@contended_write
+def hold_seats(user, performance, seats, ttl=None):
+    """Hold seats for ``user`` until a short lease runs out.
+
+    Seats already held by the same user get their lease extended. Returns
+    the new expiry time.
+    """
+    now = timezone.now()
+    expires_at = now + (ttl or settings.SEAT_HOLD_TTL)
+    requested = set(seats)
+
+    taken = find_taken_seats(performance, requested) or find_held_seats(
+        performance, requested, user
+    )
+    if taken:
+        raise SeatsUnavailable(taken)
+
+    try:
+        with transaction.atomic():
+            held = set()
+            for chunk in seat_chunks(requested):
+                holds = SeatHold.objects.filter(seats_q(chunk), performance=performance)
+                holds.filter(expires_at__lte=now).delete()
+                holds.filter(user=user).update(expires_at=expires_at)
+                held.update(holds.filter(user=user).values_list("row", "seat"))
+            SeatHold.objects.bulk_create(
+                SeatHold(
+                    performance=performance,
+                    row=row,
+                    seat=seat,
+                    user=user,
+                    expires_at=expires_at,
+                )
+                for row, seat in requested - held
+            )
+    except IntegrityError:
+        raise SeatsUnavailable(find_held_seats(performance, requested, user))
+    return expires_at
+
+
+@contended_write
+def extend_holds(user, performance, seats, ttl=None):
+    """Push back the expiry of the user's live holds; returns seats extended."""
+    now = timezone.now()
+    expires_at = now + (ttl or settings.SEAT_HOLD_TTL)
+    live = SeatHold.objects.filter(
+        performance=performance, user=user, expires_at__gt=now
+    )
+    held = []
+    with transaction.atomic():
+        for chunk in seat_chunks(seats):
+            holds = live.filter(seats_q(chunk))
+            held.extend(holds.values_list("row", "seat"))
+            holds.update(expires_at=expires_at)
+    return sorted(held), expires_at
+
+
+@contended_write
+def release_holds(user, performance, seats=None):
+    holds = SeatHold.objects.filter(performance=performance, user=user)
+    if seats is None:
+        holds.delete()
+        return
+    for chunk in seat_chunks(seats):
+        holds.filter(seats_q(chunk)).delete()
+
+
+def sweep_expired_holds(batch_size=1000):
+    """Delete expired holds in batches; returns the number removed."""
+    expired = SeatHold.objects.filter(expires_at__lte=timezone.now())
+    removed = 0
+    while True:
+        batch = list(expired.values_list("id", flat=True)[:batch_size])
+        if not batch:
+            return removed
+        removed += SeatHold.objects.filter(id__in=batch).delete()[0]
+
+
+def recount_tickets_sold(performances=None):
+    """Recompute ``Performance.tickets_sold`` and ``seats_left`` from the tickets.
+
+    One UPDATE for each of the two columns.
+    """
+    if performances is None:
+        performances = Performance.objects.all()
+    sold = (
+        Ticket.objects.filter(performance=OuterRef("pk"))
+        .order_by()
+        .values("performance")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    recounted = performances.update(tickets_sold=Coalesce(Subquery(sold), 0))
+    Performance.update_seats_left(performances)
+    return recounted
+
+
+def get_cart(user):
+    """Return the user's open cart, creating it if needed.
+
+    The cart's expiry is pushed back on every call. Concurrent calls end up
+    with the same cart: the partial unique constraint lets only one of them
+    create it and ``get_or_create`` falls back to fetching it.
+    """
+    expire_carts(Reservation.objects.filter(user=user))
+    expires_at = timezone.now() + settings.RESERVATION_CART_TTL
+    cart, created = Reservation.objects.get_or_create(
+        user=user,
+        status=Reservation.Status.CART,
+        defaults={"expires_at": expires_at},
+    )
+    if not created:
+        Reservation.objects.filter(pk=cart.pk).update(expires_at=expires_at)
+        cart.expires_at = expires_at
+    return cart
+
+
+def release_tickets(reservation_ids):
+    """Delete the tickets of reservations; returns the number deleted.
+
+    Ticket signals are muted so the rows go in batched DELETEs; the sold
+    counters are adjusted once per performance and the seat maps and
+    events follow on commit.
+    """
+    tickets = Ticket.objects.filter(reservation_id__in=reservation_ids)
+    freed = defaultdict(list)
+    for performance_id, row, seat in tickets.values_list(
+        "performance_id", "row", "seat"
+    ):
+        freed[performance_id].append((row, seat))
+    with mute_ticket_signals():
+        deleted = tickets.delete()[0]
+    for performance_id, seats in freed.items():
+        if performance_id is None:
+            continue
+        Performance.adjust_tickets_sold(performance_id, -len(seats))
+        transaction.on_commit(partial(seats_released, performance_id, seats))
+    return deleted
+
+
+@contended_write
+def change_status(reservation, status):
+    """Move a reservation to ``status`` along ``Reservation.TRANSITIONS``.
+
+    The status check and the change are one conditional UPDATE, so of two
+    concurrent transitions only one wins. Expired and cancelled
+    reservations give their seats back.
+    """
+    sources = [
+        source
+        for source, targets in Reservation.TRANSITIONS.items()
+        if status in targets
+    ]
+    reservations = Reservation.objects.filter(pk=reservation.pk, status__in=sources)
+    if status == Reservation.Status.CONFIRMED:
+        reservations = reservations.filter(
+            expires_at__gt=timezone.now(), tickets__isnull=False
+        )
+    with transaction.atomic():
+        if not reservations.update(status=status, expires_at=None):
+            raise InvalidTransition(status)
+        if status in (Reservation.Status.EXPIRED, Reservation.Status.CANCELLED):
+            release_tickets([reservation.pk])
+    reservation.status = status
+    reservation.expires_at = None
+    return reservation
+
+
+def expire_carts(reservations=None, batch_size=1000):
+    """Expire abandoned carts in batches; returns the number expired."""
+    if reservations is None:
+        reservations = Reservation.objects.all()
+    abandoned = reservations.filter(
+        status=Reservation.Status.CART, expires_at__lte=timezone.now()
+    )
+    expired = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                abandoned.select_for_update().values_list("id", flat=True)[:batch_size]
+            )
+            if not batch:
+                return expired
+            expired += Reservation.objects.filter(id__in=batch).update(
+                status=Reservation.Status.EXPIRED, expires_at=None
+            )
+            release_tickets(batch)
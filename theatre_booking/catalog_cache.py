@@ -0,0 +1,94 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from theatre_service.replicas import model_pin, pin_primary
+
+
+def catalog_cache():
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def version_key(model):
+    return f"catalog-version:{model._meta.label_lower}"
+
+
+def get_key_versions(keys):
+    cache = catalog_cache()
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # A fresh, time based version keeps evicted counters from
+            # colliding with responses cached under an older counter.
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_key_version(key):
+    cache = catalog_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def get_versions(models):
+    return get_key_versions([version_key(model) for model in models])
+
+
+def bump_version(model):
+    bump_key_version(version_key(model))
+    pin_primary(model_pin(model))
+
+
+class CatalogCacheMixin:
+    """Cache rendered JSON of list and retrieve responses.
+
+    Entries are keyed by path and query parameters plus the version of
+    every model in ``cache_models``; signal handlers bump a model version
+    whenever one of its rows changes.
+    """
+
+    cache_models = ()
+
+    def get_response_cache_key(self, request):
+        versions = ".".join(str(version) for version in get_versions(self.cache_models))
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        digest = hashlib.md5(f"{request.path}?{query}".encode()).hexdigest()
+        return f"catalog:{self.queryset.model._meta.model_name}:{versions}:{digest}"
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if request.accepted_renderer.format != "json":
+            return handler(request, *args, **kwargs)
+
+        key = self.get_response_cache_key(request)
+        cached = catalog_cache().get(key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+
+        self.response_cache_key = key
+        return handler(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(self, "response_cache_key", None)
+        if key and response.status_code == 200:
+            response.render()
+            catalog_cache().set(
+                key,
+                (response.content, response["Content-Type"]),
+                settings.CATALOG_CACHE_TIMEOUT,
+            )
+        return response
@@ -0,0 +1,174 @@
+import asyncio
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+from theatre_booking.models import Performance
+from theatre_booking.seat_map import aget_seat_map
+
+SEATS_TAKEN = "seats-taken"
+SEATS_RELEASED = "seats-released"
+SNAPSHOT = "snapshot"
+
+# Queued for a subscriber that fell too far behind; it resends a snapshot.
+RESYNC = {"type": SNAPSHOT}
+
+
+def seat_events_settings():
+    return settings.SEAT_EVENTS
+
+
+class LocalBackend:
+    """Single-process fan-out: events go straight to the local broadcaster."""
+
+    def publish(self, broadcaster, performance_id, event):
+        broadcaster.deliver(performance_id, event)
+
+    async def relay(self, broadcaster, loop, performance_id):
+        pass
+
+
+class CacheBackend:
+    """Relay events between workers through the shared cache.
+
+    Events are appended to a per-performance sequence in the cache. Each
+    worker polls it once per ``POLL_INTERVAL`` for every performance it has
+    watchers of, however many watchers that is.
+    """
+
+    def key(self, performance_id):
+        return f"seat-events:{performance_id}"
+
+    def publish(self, broadcaster, performance_id, event):
+        timeout = seat_events_settings()["EVENT_TIMEOUT"]
+        key = self.key(performance_id)
+        cache.add(key, 0, timeout)
+        try:
+            sequence = cache.incr(key)
+        except ValueError:
+            # The counter expired between add() and incr().
+            cache.add(key, 0, timeout)
+            sequence = cache.incr(key)
+        cache.set(f"{key}:{sequence}", event, timeout)
+
+    async def relay(self, broadcaster, loop, performance_id):
+        key = self.key(performance_id)
+        position = await cache.aget(key, 0)
+        while True:
+            await asyncio.sleep(seat_events_settings()["POLL_INTERVAL"])
+            current = await cache.aget(key, 0)
+            if current < position:
+                position = 0
+            for sequence in range(position + 1, current + 1):
+                event = await cache.aget(f"{key}:{sequence}")
+                if event is not None:
+                    broadcaster.fan_out(loop, performance_id, event)
+            position = current
+
+
+async def snapshot_event(performance_id):
+    performance = await Performance.objects.select_related("theatre_hall").aget(
+        pk=performance_id
+    )
+    seat_map = await aget_seat_map(performance)
+    return {
+        "type": SNAPSHOT,
+        "performance": performance_id,
+        **seat_map.to_representation(),
+    }
+
+
+class Broadcaster:
+    """Fan seat events out to the SSE streams watching a performance.
+
+    Every subscriber gets a bounded queue on its event loop. One feed task
+    per watched performance and loop sends the periodic snapshots and runs
+    the backend relay, so the cost of an event or snapshot does not grow
+    with the number of watchers.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        # performance id -> event loop -> subscriber queues
+        self.subscribers = defaultdict(dict)
+        self.feeds = {}
+
+    def subscribe(self, performance_id):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=seat_events_settings()["QUEUE_SIZE"])
+        self.subscribers[performance_id].setdefault(loop, set()).add(queue)
+        if (loop, performance_id) not in self.feeds:
+            self.feeds[(loop, performance_id)] = loop.create_task(
+                self.feed(loop, performance_id)
+            )
+        return queue
+
+    def unsubscribe(self, performance_id, queue):
+        loop = asyncio.get_running_loop()
+        loops = self.subscribers.get(performance_id, {})
+        queues = loops.get(loop, set())
+        queues.discard(queue)
+        if queues:
+            return
+        loops.pop(loop, None)
+        if not loops:
+            self.subscribers.pop(performance_id, None)
+        feed = self.feeds.pop((loop, performance_id), None)
+        if feed is not None:
+            feed.cancel()
+
+    def publish(self, performance_id, event_type, seats):
+        event = {
+            "type": event_type,
+            "performance": performance_id,
+            "seats": [list(seat) for seat in seats],
+        }
+        self.backend.publish(self, performance_id, event)
+
+    def deliver(self, performance_id, event):
+        """Hand an event to every loop watching the performance; thread-safe."""
+        for loop in list(self.subscribers.get(performance_id, ())):
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(self.fan_out, loop, performance_id, event)
+
+    def fan_out(self, loop, performance_id, event):
+        for queue in list(self.subscribers.get(performance_id, {}).get(loop, ())):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A slow client gets a fresh snapshot instead of a backlog.
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+
+    async def feed(self, loop, performance_id):
+        relay = loop.create_task(self.backend.relay(self, loop, performance_id))
+        try:
+            while True:
+                await asyncio.sleep(seat_events_settings()["SNAPSHOT_INTERVAL"])
+                try:
+                    event = await snapshot_event(performance_id)
+                except Performance.DoesNotExist:
+                    continue
+                self.fan_out(loop, performance_id, event)
+        finally:
+            relay.cancel()
+
+
+broadcaster = None
+
+
+def get_broadcaster():
+    global broadcaster
+    if broadcaster is None:
+        backend = import_string(seat_events_settings()["BACKEND"])
+        broadcaster = Broadcaster(backend())
+    return broadcaster
+
+
+def publish_seats(performance_id, seats, taken=True):
+    get_broadcaster().publish(
+        performance_id, SEATS_TAKEN if taken else SEATS_RELEASED, seats
+    )
@@ -0,0 +1,284 @@
+import csv
+import json
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from theatre_booking.catalog_cache import bump_version
+from theatre_booking.models import Actor, Genre, Performance, Play, TheatreHall
+from theatre_booking.performance_calendar import invalidate_days
+from theatre_booking.search import index_plays
+
+RECORD_TYPES = ("genre", "actor", "theatre_hall", "play", "performance")
+
+# CSV cells holding several names use this separator, e.g. "Drama|Comedy".
+LIST_SEPARATOR = "|"
+
+
+class RowError(Exception):
+    pass
+
+
+def read_ndjson(lines):
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            yield line_number, {"type": None, "error": f"Invalid JSON: {error}"}
+            continue
+        if not isinstance(record, dict):
+            record = {"type": None, "error": "Record must be a JSON object"}
+        yield line_number, record
+
+
+def read_csv(lines):
+    reader = csv.DictReader(lines)
+    for record in reader:
+        record = {
+            key: value for key, value in record.items() if value not in ("", None)
+        }
+        for field in ("actors", "genres"):
+            if field in record:
+                record[field] = [
+                    name.strip()
+                    for name in record[field].split(LIST_SEPARATOR)
+                    if name.strip()
+                ]
+        yield reader.line_num, record
+
+
+def required(record, field):
+    value = record.get(field)
+    if value in (None, ""):
+        raise RowError(f"{field} is required")
+    return value
+
+
+def positive_int(record, field):
+    try:
+        value = int(required(record, field))
+    except (TypeError, ValueError):
+        raise RowError(f"{field} must be an integer")
+    if value < 1:
+        raise RowError(f"{field} must be positive")
+    return value
+
+
+def name_list(record, field):
+    value = record.get(field) or []
+    if isinstance(value, str):
+        value = [value]
+    return list(value)
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = dict.fromkeys(RECORD_TYPES, 0)
+        self.existing = dict.fromkeys(RECORD_TYPES, 0)
+        self.errors = []
+
+    def error(self, line_number, record_type, message):
+        self.errors.append(
+            {"line": line_number, "type": record_type, "error": str(message)}
+        )
+
+    def to_representation(self):
+        return {
+            "created": self.created,
+            "existing": self.existing,
+            # Rows are written grouped by type, so restore file order.
+            "errors": sorted(self.errors, key=lambda error: error["line"]),
+        }
+
+
+class ScheduleImporter:
+    """Load catalog and schedule rows in batched, transactional bulk inserts.
+
+    Catalog rows are matched by natural key (genre and hall name, actor full
+    name, play title) against lookup maps loaded once, so re-running an
+    import does not duplicate them. Within a batch rows are written in
+    dependency order, so a play may refer to actors defined later in the
+    same batch.
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.report = ImportReport()
+        self.genres = dict(Genre.objects.values_list("name", "id"))
+        self.actors = {
+            (first_name, last_name): pk
+            for pk, first_name, last_name in Actor.objects.values_list(
+                "id", "first_name", "last_name"
+            )
+        }
+        self.halls = dict(TheatreHall.objects.values_list("name", "id"))
+        self.plays = dict(Play.objects.values_list("title", "id"))
+
+    def run(self, records):
+        records = iter(records)
+        while batch := list(islice(records, self.batch_size)):
+            self.import_batch(batch)
+        return self.report
+
+    def import_batch(self, batch):
+        by_type = {record_type: [] for record_type in RECORD_TYPES}
+        for line_number, record in batch:
+            record_type = record.get("type")
+            if "error" in record:
+                self.report.error(line_number, record_type, record["error"])
+            elif record_type not in by_type:
+                self.report.error(
+                    line_number, record_type, f"Unknown record type {record_type!r}"
+                )
+            else:
+                by_type[record_type].append((line_number, record))
+
+        with transaction.atomic():
+            touched = set()
+            for record_type in RECORD_TYPES:
+                if by_type[record_type]:
+                    handler = getattr(self, f"import_{record_type}s")
+                    touched.update(handler(by_type[record_type]))
+            # bulk_create skips model signals, so refresh what they maintain.
+            for model in touched:
+                transaction.on_commit(lambda model=model: bump_version(model))
+
+    def rows(self, record_type, rows, build):
+        for line_number, record in rows:
+            try:
+                yield build(record)
+            except RowError as error:
+                self.report.error(line_number, record_type, error)
+
+    def import_genres(self, rows):
+        names = {}
+        for name in self.rows("genre", rows, lambda record: required(record, "name")):
+            if name in self.genres or name in names:
+                self.report.existing["genre"] += 1
+            else:
+                names[name] = Genre(name=name)
+        created = Genre.objects.bulk_create(names.values())
+        self.genres.update((genre.name, genre.id) for genre in created)
+        self.report.created["genre"] += len(created)
+        return [Genre] if created else []
+
+    def import_actors(self, rows):
+        actors = {}
+
+        def build(record):
+            return required(record, "first_name"), required(record, "last_name")
+
+        for key in self.rows("actor", rows, build):
+            if key in self.actors or key in actors:
+                self.report.existing["actor"] += 1
+            else:
+                actors[key] = Actor(first_name=key[0], last_name=key[1])
+        created = Actor.objects.bulk_create(actors.values())
+        self.actors.update(
+            ((actor.first_name, actor.last_name), actor.id) for actor in created
+        )
+        self.report.created["actor"] += len(created)
+        return [Actor] if created else []
+
+    def import_theatre_halls(self, rows):
+        halls = {}
+
+        def build(record):
+            return TheatreHall(
+                name=required(record, "name"),
+                rows=positive_int(record, "rows"),
+                seats_in_row=positive_int(record, "seats_in_row"),
+            )
+
+        for hall in self.rows("theatre_hall", rows, build):
+            if hall.name in self.halls or hall.name in halls:
+                self.report.existing["theatre_hall"] += 1
+            else:
+                halls[hall.name] = hall
+        created = TheatreHall.objects.bulk_create(halls.values())
+        self.halls.update((hall.name, hall.id) for hall in created)
+        self.report.created["theatre_hall"] += len(created)
+        return [TheatreHall] if created else []
+
+    def import_plays(self, rows):
+        plays = {}
+
+        def build(record):
+            actor_ids = []
+            for full_name in name_list(record, "actors"):
+                first_name, _, last_name = full_name.partition(" ")
+                actor_id = self.actors.get((first_name, last_name))
+                if actor_id is None:
+                    raise RowError(f"Unknown actor {full_name!r}")
+                actor_ids.append(actor_id)
+            genre_ids = []
+            for name in name_list(record, "genres"):
+                if name not in self.genres:
+                    raise RowError(f"Unknown genre {name!r}")
+                genre_ids.append(self.genres[name])
+            play = Play(
+                title=required(record, "title"),
+                description=record.get("description", ""),
+            )
+            return play, actor_ids, genre_ids
+
+        for play, actor_ids, genre_ids in self.rows("play", rows, build):
+            if play.title in self.plays or play.title in plays:
+                self.report.existing["play"] += 1
+            else:
+                plays[play.title] = (play, actor_ids, genre_ids)
+        created = Play.objects.bulk_create(play for play, _, _ in plays.values())
+        Play.actors.through.objects.bulk_create(
+            Play.actors.through(play_id=play.id, actor_id=actor_id)
+            for play, actor_ids, _ in plays.values()
+            for actor_id in set(actor_ids)
+        )
+        Play.genres.through.objects.bulk_create(
+            Play.genres.through(play_id=play.id, genre_id=genre_id)
+            for play, _, genre_ids in plays.values()
+            for genre_id in set(genre_ids)
+        )
+        self.plays.update((play.title, play.id) for play in created)
+        self.report.created["play"] += len(created)
+        if not created:
+            return []
+        play_ids = [play.id for play in created]
+        transaction.on_commit(lambda: index_plays(play_ids))
+        return [Play]
+
+    def import_performances(self, rows):
+        def build(record):
+            play_id = self.plays.get(required(record, "play"))
+            if play_id is None:
+                raise RowError(f"Unknown play {record['play']!r}")
+            hall_id = self.halls.get(required(record, "theatre_hall"))
+            if hall_id is None:
+                raise RowError(f"Unknown theatre hall {record['theatre_hall']!r}")
+            showtime = parse_datetime(str(required(record, "showtime")))
+            if showtime is None:
+                raise RowError("showtime must be an ISO 8601 datetime")
+            if timezone.is_naive(showtime):
+                showtime = timezone.make_aware(showtime)
+            return Performance(
+                play_id=play_id, theatre_hall_id=hall_id, showtime=showtime
+            )
+
+        created = Performance.objects.bulk_create(self.rows("performance", rows, build))
+        Performance.update_seats_left(
+            Performance.objects.filter(
+                pk__in=[performance.pk for performance in created]
+            )
+        )
+        self.report.created["performance"] += len(created)
+        showtimes = [performance.showtime for performance in created]
+        transaction.on_commit(lambda: invalidate_days(showtimes))
+        return []
+
+
+def import_schedule(lines, file_format, batch_size=1000):
+    reader = read_csv if file_format == "csv" else read_ndjson
+    return ScheduleImporter(batch_size=batch_size).run(reader(lines))
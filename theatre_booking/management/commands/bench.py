@@ -0,0 +1,191 @@
+import json
+import statistics
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    CaptureQueriesContext,
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from theatre_booking.benchmarks import percentile, seed_dataset, throwaway_database
+from theatre_booking.urls import router
+from user.urls import urlpatterns as user_urlpatterns
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database and measure latency percentiles, queries "
+        "per request and peak memory of every GET route as JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--halls", type=int, default=10)
+        parser.add_argument("--genres", type=int, default=20)
+        parser.add_argument("--actors", type=int, default=500)
+        parser.add_argument("--plays", type=int, default=200)
+        parser.add_argument("--performances", type=int, default=2000)
+        parser.add_argument("--tickets", type=int, default=100_000)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument(
+            "--requests", type=int, default=50, help="Requests timed per route"
+        )
+        parser.add_argument(
+            "--cold",
+            action="store_true",
+            help="Clear the cache before every request",
+        )
+        parser.add_argument("--output", help="Write the JSON report to this file")
+        parser.add_argument("--baseline", help="JSON report to compare against")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.2,
+            help="Allowed relative p50 slowdown against the baseline",
+        )
+
+    def handle(self, *args, **options):
+        dataset = {
+            name: options[name]
+            for name in (
+                "users",
+                "halls",
+                "genres",
+                "actors",
+                "plays",
+                "performances",
+                "tickets",
+            )
+        }
+        setup_test_environment()
+        try:
+            with throwaway_database(), override_settings(
+                REST_FRAMEWORK={
+                    **settings.REST_FRAMEWORK,
+                    "DEFAULT_THROTTLE_CLASSES": [],
+                }
+            ):
+                started = time.perf_counter()
+                users = seed_dataset(batch_size=options["batch_size"], **dataset)
+                seed_seconds = time.perf_counter() - started
+
+                client = APIClient()
+                client.force_authenticate(user=users[0])
+                routes = {
+                    name: self.measure(client, url, options)
+                    for name, url in self.routes()
+                }
+        finally:
+            teardown_test_environment()
+
+        report = {
+            "dataset": dataset,
+            "seed_seconds": round(seed_seconds, 3),
+            "requests": options["requests"],
+            "cold": options["cold"],
+            "routes": routes,
+        }
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output)
+        self.stdout.write(output)
+
+        if options["baseline"]:
+            with open(options["baseline"]) as file:
+                baseline = json.load(file)
+            regressions = self.regressions(
+                baseline["routes"], routes, options["threshold"]
+            )
+            if regressions:
+                raise CommandError("Regressions: " + "; ".join(regressions))
+
+    def routes(self):
+        for prefix, viewset, basename in router.registry:
+            model = viewset.queryset.model
+            pk = model.objects.order_by("pk").values_list("pk", flat=True).first()
+            yield f"{basename}-list", reverse(f"theatre_service:{basename}-list")
+            if pk is not None:
+                yield f"{basename}-detail", reverse(
+                    f"theatre_service:{basename}-detail", args=[pk]
+                )
+            for extra in viewset.get_extra_actions():
+                if "get" not in extra.mapping:
+                    continue
+                name = f"{basename}-{extra.url_name}"
+                if extra.detail:
+                    if pk is None:
+                        continue
+                    url = reverse(f"theatre_service:{name}", args=[pk])
+                else:
+                    url = reverse(f"theatre_service:{name}")
+                yield name, url
+
+        for pattern in user_urlpatterns:
+            if hasattr(pattern.callback.view_class, "get"):
+                yield f"user-{pattern.name}", reverse(f"user:{pattern.name}")
+
+    def request(self, client, url, cold):
+        if cold:
+            cache.clear()
+        response = client.get(url)
+        if getattr(response, "streaming", False):
+            b"".join(response.streaming_content)
+        return response
+
+    def measure(self, client, url, options):
+        cache.clear()
+        latencies = []
+        queries = []
+        status_code = None
+        for _ in range(options["requests"]):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                status_code = self.request(client, url, options["cold"]).status_code
+                latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+
+        cache.clear()
+        tracemalloc.start()
+        try:
+            self.request(client, url, options["cold"])
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        return {
+            "url": url,
+            "status": status_code,
+            "p50_ms": round(percentile(latencies, 0.5), 3),
+            "p90_ms": round(percentile(latencies, 0.9), 3),
+            "p99_ms": round(percentile(latencies, 0.99), 3),
+            "mean_ms": round(statistics.fmean(latencies), 3),
+            "queries_first": queries[0],
+            "queries_median": statistics.median(queries),
+            "peak_memory_kib": round(peak_memory / 1024, 1),
+        }
+
+    @staticmethod
+    def regressions(baseline, current, threshold):
+        found = []
+        for name, before in baseline.items():
+            after = current.get(name)
+            if after is None:
+                continue
+            if after["p50_ms"] > before["p50_ms"] * (1 + threshold):
+                found.append(f"{name} p50 {before['p50_ms']}ms -> {after['p50_ms']}ms")
+            if after["queries_median"] > before["queries_median"]:
+                found.append(
+                    f"{name} queries {before['queries_median']} -> "
+                    f"{after['queries_median']}"
+                )
+        return found
@@ -0,0 +1,134 @@
+import json
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from theatre_booking.allocation import NoAdjacentSeats, SeatAllocator, allocate_seats
+from theatre_booking.benchmarks import percentile, throwaway_database
+from theatre_booking.booking import SeatsUnavailable
+from theatre_booking.models import Performance, Play, TheatreHall, Ticket
+from theatre_booking.seat_map import SeatMap
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the best-available seat allocator on a large hall, then "
+        "simulate an on-sale: thousands of concurrent allocation requests "
+        "against one performance in a throwaway database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=60)
+        parser.add_argument("--seats-in-row", type=int, default=50)
+        parser.add_argument("--repeat", type=int, default=1000)
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--max-seats", type=int, default=6)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        report = {"allocator": self.bench_allocator(rng, options)}
+        setup_test_environment()
+        try:
+            # Threads writing to SQLite's shared in-memory test database fail
+            # with "table is locked" instead of waiting, so use a file.
+            with tempfile.TemporaryDirectory() as directory, throwaway_database(
+                name=(
+                    os.path.join(directory, "bench.sqlite3")
+                    if connection.vendor == "sqlite"
+                    else None
+                )
+            ):
+                report["on_sale"] = self.bench_on_sale(rng, options)
+        finally:
+            teardown_test_environment()
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def bench_allocator(self, rng, options):
+        """Pick 4 seats from halls filled to different levels at random."""
+        rows, seats_in_row = options["rows"], options["seats_in_row"]
+        report = {"seats": rows * seats_in_row}
+        for fill in (0.0, 0.5, 0.9, 0.98):
+            seat_map = SeatMap(rows, seats_in_row)
+            for row in range(1, rows + 1):
+                for seat in range(1, seats_in_row + 1):
+                    if rng.random() < fill:
+                        seat_map.mark(row, seat)
+            latencies = []
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                seats = SeatAllocator(seat_map).allocate(4)
+                latencies.append((time.perf_counter() - started) * 1_000_000)
+            report[f"{int(fill * 100)}%_full"] = {
+                "found": seats is not None,
+                "p50_us": round(percentile(latencies, 0.5), 1),
+                "p99_us": round(percentile(latencies, 0.99), 1),
+            }
+        return report
+
+    def bench_on_sale(self, rng, options):
+        hall = TheatreHall.objects.create(
+            name="Bench Hall",
+            rows=options["rows"],
+            seats_in_row=options["seats_in_row"],
+        )
+        performance = Performance.objects.create(
+            play=Play.objects.create(title="Bench Play", description=""),
+            theatre_hall=hall,
+            showtime=timezone.now(),
+        )
+        User = get_user_model()
+        users = User.objects.bulk_create(
+            User(username=f"bench-buyer-{index}")
+            for index in range(options["requests"])
+        )
+        counts = [rng.randint(1, options["max_seats"]) for _ in users]
+        outcomes = Counter()
+        latencies = []
+
+        def request(user, count):
+            started = time.perf_counter()
+            try:
+                allocate_seats(user, performance, count)
+                outcome = "booked"
+            except NoAdjacentSeats:
+                outcome = "no_seats"
+            except SeatsUnavailable:
+                outcome = "conflict"
+            except OperationalError:
+                outcome = "database_error"
+            latencies.append((time.perf_counter() - started) * 1000)
+            outcomes[outcome] += 1
+            return count if outcome == "booked" else 0
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            booked = sum(executor.map(request, users, counts))
+        elapsed = time.perf_counter() - started
+
+        performance.refresh_from_db()
+        sold = Ticket.objects.filter(performance=performance).count()
+        connection.close()
+        return {
+            "requests": len(users),
+            "concurrency": options["concurrency"],
+            "seconds": round(elapsed, 3),
+            "requests_per_second": round(len(users) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 0.5), 3),
+            "p99_ms": round(percentile(latencies, 0.99), 3),
+            "outcomes": dict(outcomes),
+            "seats_booked": booked,
+            "tickets_sold": sold,
+            "counter_matches": performance.tickets_sold == sold == booked,
+            "capacity": hall.capacity,
+        }
@@ -0,0 +1,216 @@
+import asyncio
+import io
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from theatre_booking.benchmarks import percentile, seed_dataset, throwaway_database
+from theatre_booking.models import Performance
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database and compare the concurrent throughput of "
+        "the async performance endpoints under ASGI with the sync ones under "
+        "WSGI, driving both applications in process"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--halls", type=int, default=10)
+        parser.add_argument("--plays", type=int, default=200)
+        parser.add_argument("--performances", type=int, default=2000)
+        parser.add_argument("--tickets", type=int, default=100_000)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument(
+            "--requests", type=int, default=500, help="Requests per endpoint"
+        )
+
+    def handle(self, *args, **options):
+        from theatre_service.asgi import application as asgi_application
+        from theatre_service.wsgi import application as wsgi_application
+
+        setup_test_environment()
+        try:
+            with throwaway_database(), override_settings(
+                REST_FRAMEWORK={
+                    **settings.REST_FRAMEWORK,
+                    "DEFAULT_THROTTLE_CLASSES": [],
+                }
+            ):
+                users = seed_dataset(
+                    users=2,
+                    halls=options["halls"],
+                    genres=20,
+                    actors=500,
+                    plays=options["plays"],
+                    performances=options["performances"],
+                    tickets=options["tickets"],
+                    batch_size=options["batch_size"],
+                )
+                pk = (
+                    Performance.objects.filter(showtime__gte=timezone.now())
+                    .order_by("showtime", "id")
+                    .values_list("id", flat=True)
+                    .first()
+                )
+                headers = {"authorization": f"Bearer {AccessToken.for_user(users[1])}"}
+                endpoints = {
+                    "performance-list": [],
+                    "performance-detail": [pk],
+                    "performance-seats": [pk],
+                }
+                report = {}
+                for name, args in endpoints.items():
+                    wsgi_url = reverse(f"theatre_service:{name}", args=args)
+                    asgi_url = reverse(f"theatre_service:async-{name}", args=args)
+                    wsgi = self.run_wsgi(wsgi_application, wsgi_url, headers, options)
+                    asgi = asyncio.run(
+                        self.run_asgi(asgi_application, asgi_url, headers, options)
+                    )
+                    report[name] = {
+                        "wsgi": wsgi,
+                        "asgi": asgi,
+                        "asgi_speedup": round(
+                            asgi["requests_per_second"] / wsgi["requests_per_second"],
+                            2,
+                        ),
+                    }
+        finally:
+            teardown_test_environment()
+
+        self.stdout.write(json.dumps(report, indent=2))
+
+    @staticmethod
+    def summary(latencies, statuses, elapsed, concurrency):
+        return {
+            "requests": len(latencies),
+            "concurrency": concurrency,
+            "seconds": round(elapsed, 3),
+            "requests_per_second": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 0.5), 3),
+            "p99_ms": round(percentile(latencies, 0.99), 3),
+            "errors": sum(1 for status in statuses if status != 200),
+        }
+
+    @staticmethod
+    def shares(total, workers):
+        return [
+            total // workers + (index < total % workers) for index in range(workers)
+        ]
+
+    def run_wsgi(self, application, url, headers, options):
+        """Threaded WSGI server model: one request per thread at a time."""
+        url = urlsplit(url)
+        latencies, statuses = [], []
+
+        def request():
+            environ = {
+                "REQUEST_METHOD": "GET",
+                "PATH_INFO": url.path,
+                "QUERY_STRING": url.query,
+                "SERVER_NAME": "testserver",
+                "SERVER_PORT": "80",
+                "SERVER_PROTOCOL": "HTTP/1.1",
+                "HTTP_HOST": "testserver",
+                "wsgi.version": (1, 0),
+                "wsgi.url_scheme": "http",
+                "wsgi.input": io.BytesIO(),
+                "wsgi.errors": sys.stderr,
+                "wsgi.multithread": True,
+                "wsgi.multiprocess": False,
+                "wsgi.run_once": False,
+            }
+            for name, value in headers.items():
+                environ["HTTP_" + name.upper().replace("-", "_")] = value
+            status = []
+            response = application(
+                environ, lambda code, *_: status.append(int(code.split()[0]))
+            )
+            try:
+                b"".join(response)
+            finally:
+                response.close()
+            return status[0]
+
+        def worker(count):
+            for _ in range(count):
+                started = time.perf_counter()
+                statuses.append(request())
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        concurrency = options["concurrency"]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [
+                executor.submit(worker, count)
+                for count in self.shares(options["requests"], concurrency)
+            ]:
+                future.result()
+        elapsed = time.perf_counter() - started
+        return self.summary(latencies, statuses, elapsed, concurrency)
+
+    async def run_asgi(self, application, url, headers, options):
+        """Concurrent connections served by one event loop."""
+        url = urlsplit(url)
+        latencies, statuses = [], []
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": url.path,
+            "raw_path": url.path.encode(),
+            "query_string": url.query.encode(),
+            "root_path": "",
+            "headers": [(b"host", b"testserver")]
+            + [(name.encode(), value.encode()) for name, value in headers.items()],
+            "client": ("127.0.0.1", 0),
+            "server": ("testserver", 80),
+        }
+
+        async def request():
+            received = asyncio.Event()
+            status = []
+
+            async def receive():
+                if received.is_set():
+                    # Keep the connection open until the handler is done.
+                    await asyncio.Future()
+                received.set()
+                return {"type": "http.request", "body": b"", "more_body": False}
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    status.append(message["status"])
+
+            await application(dict(scope), receive, send)
+            return status[0]
+
+        async def worker(count):
+            for _ in range(count):
+                started = time.perf_counter()
+                statuses.append(await request())
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        concurrency = options["concurrency"]
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(worker(count) for count in self.shares(options["requests"], concurrency))
+        )
+        elapsed = time.perf_counter() - started
+        return self.summary(latencies, statuses, elapsed, concurrency)
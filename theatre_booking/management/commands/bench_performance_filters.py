@@ -0,0 +1,80 @@
+import json
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from theatre_booking.benchmarks import seed_dataset, throwaway_database
+from theatre_booking.models import Genre, Performance, Play, TheatreHall
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed performances into a throwaway test database and report query "
+        "plans and timings of the performance list filters"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--performances", type=int, default=1_000_000)
+        parser.add_argument("--plays", type=int, default=1000)
+        parser.add_argument("--halls", type=int, default=20)
+        parser.add_argument("--genres", type=int, default=20)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        with throwaway_database() as connection:
+            seed_dataset(
+                users=1,
+                halls=options["halls"],
+                genres=options["genres"],
+                actors=0,
+                plays=options["plays"],
+                performances=options["performances"],
+                tickets=0,
+                batch_size=options["batch_size"],
+            )
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+            report = [
+                self.measure(name, queryset, options["repeat"])
+                for name, queryset in self.filtered_querysets()
+            ]
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def filtered_querysets(self):
+        now = timezone.now()
+        play = Play.objects.order_by("?").first()
+        hall = TheatreHall.objects.order_by("?").first()
+        genre = Genre.objects.order_by("?").first()
+        upcoming = Performance.objects.order_by("showtime", "id")
+        return [
+            ("upcoming", upcoming.filter(showtime__gte=now)),
+            (
+                "date_range",
+                upcoming.filter(
+                    showtime__gte=now, showtime__lte=now + timedelta(days=7)
+                ),
+            ),
+            ("play", upcoming.filter(showtime__gte=now, play=play)),
+            ("theatre_hall", upcoming.filter(showtime__gte=now, theatre_hall=hall)),
+            ("genre", upcoming.filter(showtime__gte=now, play__genres=genre)),
+        ]
+
+    def measure(self, name, queryset, repeat):
+        page = queryset[:50]
+        plan = page.explain()
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(page.values_list("id", flat=True))
+            timings.append((time.perf_counter() - started) * 1000)
+        return {
+            "filter": name,
+            "plan": plan.splitlines(),
+            "uses_index": "USING INDEX" in plan or "USING COVERING INDEX" in plan,
+            "median_ms": round(statistics.median(timings), 3),
+            "max_ms": round(max(timings), 3),
+        }
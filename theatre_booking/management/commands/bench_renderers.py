@@ -0,0 +1,78 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from theatre_booking.benchmarks import seed_dataset, throwaway_database
+from theatre_booking.models import Performance, Play
+from theatre_booking.serializers import PerformanceListSerializer, PlayListSerializer
+from theatre_booking.views import with_availability
+from theatre_service.renderers import MessagePackRenderer, OrjsonRenderer
+
+RENDERERS = {
+    "drf-json": JSONRenderer,
+    "orjson": OrjsonRenderer,
+    "msgpack": MessagePackRenderer,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database and compare rendering throughput of the "
+        "performance and play lists with the default and fast renderers"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--performances", type=int, default=200)
+        parser.add_argument("--plays", type=int, default=200)
+        parser.add_argument("--repeat", type=int, default=50)
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            seed_dataset(
+                users=1,
+                plays=options["plays"],
+                performances=options["performances"],
+                tickets=0,
+            )
+            payloads = {
+                # One page of each list, as returned by the API.
+                "performance-list": PerformanceListSerializer(
+                    with_availability(Performance.objects.all())
+                    .select_related("play")
+                    .prefetch_related("play__actors", "play__genres")[
+                        : options["performances"]
+                    ],
+                    many=True,
+                ).data,
+                "play-list": PlayListSerializer(
+                    Play.objects.prefetch_related("actors", "genres")[
+                        : options["plays"]
+                    ],
+                    many=True,
+                ).data,
+            }
+
+        report = {
+            name: {
+                renderer_name: self.measure(renderer_class(), data, options["repeat"])
+                for renderer_name, renderer_class in RENDERERS.items()
+            }
+            for name, data in payloads.items()
+        }
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def measure(self, renderer, data, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            content = renderer.render(data)
+            timings.append(time.perf_counter() - started)
+        median = statistics.median(timings)
+        return {
+            "bytes": len(content),
+            "median_ms": round(median * 1000, 3),
+            "mb_per_second": round(len(content) / median / 1_000_000, 1),
+        }
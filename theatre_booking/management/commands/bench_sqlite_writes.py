@@ -0,0 +1,118 @@
+import json
+import math
+import os
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from theatre_booking.benchmarks import percentile, throwaway_database
+from theatre_booking.booking import SeatsUnavailable, book_seats
+from theatre_booking.models import Performance, Play, TheatreHall, Ticket
+
+
+class Command(BaseCommand):
+    help = (
+        "Book seats from many writer threads against a file SQLite database, "
+        "once with the stock connection options and a plain book_seats and "
+        "once with the configured pragmas, IMMEDIATE transactions and lock "
+        "retries"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bookings", type=int, default=2000)
+        parser.add_argument("--threads", type=int, default=32)
+        parser.add_argument("--seats", type=int, default=2)
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("This benchmark needs an SQLite default database")
+
+        tuned_options = connection.settings_dict["OPTIONS"]
+        profiles = {
+            "stock": ({}, book_seats.__wrapped__),
+            "tuned": (tuned_options, book_seats),
+        }
+        report = {}
+        setup_test_environment()
+        try:
+            for name, (db_options, book) in profiles.items():
+                connection.settings_dict["OPTIONS"] = db_options
+                with tempfile.TemporaryDirectory() as directory, throwaway_database(
+                    name=os.path.join(directory, f"{name}.sqlite3")
+                ):
+                    report[name] = self.bench(book, options)
+        finally:
+            connection.settings_dict["OPTIONS"] = tuned_options
+            teardown_test_environment()
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def bench(self, book, options):
+        seats_per_booking = options["seats"]
+        seats_in_row = 50
+        hall = TheatreHall.objects.create(
+            name="Bench Hall",
+            rows=math.ceil(options["bookings"] * seats_per_booking / seats_in_row),
+            seats_in_row=seats_in_row,
+        )
+        performance = Performance.objects.create(
+            play=Play.objects.create(title="Bench Play", description=""),
+            theatre_hall=hall,
+            showtime=timezone.now(),
+        )
+        User = get_user_model()
+        users = User.objects.bulk_create(
+            User(username=f"bench-writer-{index}")
+            for index in range(options["threads"])
+        )
+        # Every booking gets seats of its own, so failures are lock errors.
+        bookings = [
+            [
+                divmod(index * seats_per_booking + offset, seats_in_row)
+                for offset in range(seats_per_booking)
+            ]
+            for index in range(options["bookings"])
+        ]
+        outcomes = Counter()
+        latencies = []
+
+        def request(index):
+            seats = [(row + 1, seat + 1) for row, seat in bookings[index]]
+            started = time.perf_counter()
+            try:
+                book(users[index % len(users)], performance, seats)
+                outcome = "booked"
+            except SeatsUnavailable:
+                outcome = "conflict"
+            except OperationalError as error:
+                outcome = str(error)
+            finally:
+                # Like a request with CONN_MAX_AGE = 0
+                connection.close()
+            latencies.append((time.perf_counter() - started) * 1000)
+            outcomes[outcome] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["threads"]) as executor:
+            list(executor.map(request, range(options["bookings"])))
+        elapsed = time.perf_counter() - started
+
+        performance.refresh_from_db()
+        sold = Ticket.objects.filter(performance=performance).count()
+        connection.close()
+        return {
+            "bookings": options["bookings"],
+            "threads": options["threads"],
+            "seconds": round(elapsed, 3),
+            "bookings_per_second": round(outcomes["booked"] / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 0.5), 3),
+            "p99_ms": round(percentile(latencies, 0.99), 3),
+            "outcomes": dict(outcomes),
+            "counter_matches": performance.tickets_sold == sold,
+        }
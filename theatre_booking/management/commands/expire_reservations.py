@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from theatre_booking.booking import expire_carts
+
+
+class Command(BaseCommand):
+    help = "Expire abandoned ticket carts in batches and free their seats"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        expired = expire_carts(batch_size=options["batch_size"])
+        self.stdout.write(f"Expired {expired} abandoned carts")
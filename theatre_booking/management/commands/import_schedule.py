@@ -0,0 +1,39 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from theatre_booking.importer import import_schedule
+
+
+class Command(BaseCommand):
+    help = (
+        "Import genres, actors, theatre halls, plays and performances from a "
+        "CSV or NDJSON file with a 'type' column, in batched bulk inserts"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import, or - for stdin")
+        parser.add_argument("--file-format", choices=("csv", "ndjson"))
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["file_format"]
+        if file_format is None:
+            if path.endswith(".csv"):
+                file_format = "csv"
+            elif path.endswith((".ndjson", ".jsonl")) or path == "-":
+                file_format = "ndjson"
+            else:
+                raise CommandError("Cannot infer the format, pass --file-format")
+
+        if path == "-":
+            report = import_schedule(sys.stdin, file_format, options["batch_size"])
+        else:
+            with open(path, newline="", encoding="utf-8") as file:
+                report = import_schedule(file, file_format, options["batch_size"])
+
+        self.stdout.write(json.dumps(report.to_representation(), indent=2))
+        if report.errors:
+            raise CommandError(f"{len(report.errors)} rows were not imported")
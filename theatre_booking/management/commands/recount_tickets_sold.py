@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from theatre_booking.booking import recount_tickets_sold
+from theatre_booking.catalog_cache import bump_version
+from theatre_booking.models import Performance
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the sold ticket counter of every performance from its "
+        "tickets, one batch of performances per transaction"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        ids = Performance.objects.order_by("id").values_list("id", flat=True)
+        last_id = 0
+        recounted = 0
+        while True:
+            batch = list(ids.filter(id__gt=last_id)[: options["batch_size"]])
+            if not batch:
+                break
+            with transaction.atomic():
+                recounted += recount_tickets_sold(
+                    Performance.objects.filter(id__gt=last_id, id__lte=batch[-1])
+                )
+            last_id = batch[-1]
+        # Every day of the performance calendar may have changed.
+        bump_version(Performance)
+        self.stdout.write(f"Recounted sold tickets of {recounted} performances")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from theatre_booking.booking import sweep_expired_holds
+
+
+class Command(BaseCommand):
+    help = "Delete expired seat holds in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        removed = sweep_expired_holds(batch_size=options["batch_size"])
+        self.stdout.write(f"Removed {removed} expired seat holds")
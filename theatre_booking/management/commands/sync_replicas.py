@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def copy_database(source, target):
+    """Copy a SQLite database onto another with the online backup API.
+
+    Readers of the target see either the old or the new copy, never a mix.
+    """
+    source.ensure_connection()
+    target.ensure_connection()
+    source.connection.backup(target.connection)
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database onto every read replica in "
+        "READ_REPLICAS, once or every --interval seconds"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=0)
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != "sqlite":
+            raise CommandError(
+                "Only SQLite replicas are copied; other databases replicate "
+                "with their own tools"
+            )
+        if not settings.READ_REPLICAS:
+            raise CommandError("No replicas configured in DATABASE_REPLICAS")
+
+        while True:
+            started = time.perf_counter()
+            for alias in settings.READ_REPLICAS:
+                copy_database(primary, connections[alias])
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stdout.write(
+                f"Synced {len(settings.READ_REPLICAS)} replicas in {elapsed:.1f} ms"
+            )
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,55 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from theatre_booking.views import (
+    ActorViewSet,
+    GenreViewSet,
+    TheatreHallViewSet,
+    PlayViewSet,
+)
+
+CATALOG_VIEWSETS = (
+    ("actor", ActorViewSet),
+    ("genre", GenreViewSet),
+    ("theatrehall", TheatreHallViewSet),
+    ("play", PlayViewSet),
+)
+
+
+class Command(BaseCommand):
+    help = "Render catalog list (and optionally detail) responses into the cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--detail",
+            action="store_true",
+            help="Also warm the retrieve response of every object",
+        )
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        # The cached payload does not depend on who asks, only that the
+        # request passes the authenticated read-only permission.
+        user = get_user_model()(username="catalog-cache-warmer")
+
+        for basename, viewset in CATALOG_VIEWSETS:
+            list_view = viewset.as_view({"get": "list"})
+            request = factory.get(reverse(f"theatre_service:{basename}-list"))
+            force_authenticate(request, user=user)
+            list_view(request).render()
+            warmed = 1
+
+            if options["detail"]:
+                detail_view = viewset.as_view({"get": "retrieve"})
+                pks = viewset.queryset.values_list("pk", flat=True)
+                for pk in pks.iterator():
+                    request = factory.get(
+                        reverse(f"theatre_service:{basename}-detail", args=[pk])
+                    )
+                    force_authenticate(request, user=user)
+                    detail_view(request, pk=pk).render()
+                    warmed += 1
+
+            self.stdout.write(f"Warmed {warmed} {basename} responses")
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.3 on 2026-10-18 17:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("theatre_booking", "0006_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="performance",
+            index=models.Index(
+                fields=["play", "showtime"], name="performance_play_time_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="performance",
+            index=models.Index(
+                fields=["theatre_hall", "showtime"], name="performance_hall_time_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,58 @@
+from django.db import migrations
+
+FTS_TABLE = "theatre_booking_play_fts"
+
+
+def create_play_fts(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        if "ENABLE_FTS5" not in {row[0] for row in cursor.fetchall()}:
+            return
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            f"title, description, actors, genres, "
+            f"tokenize='unicode61 remove_diacritics 2')"
+        )
+
+    Play = apps.get_model("theatre_booking", "Play")
+    documents = [
+        (
+            play.id,
+            play.title,
+            play.description,
+            " ".join(
+                f"{actor.first_name} {actor.last_name}" for actor in play.actors.all()
+            ),
+            " ".join(genre.name for genre in play.genres.all()),
+        )
+        for play in Play.objects.prefetch_related("actors", "genres").iterator(
+            chunk_size=1000
+        )
+    ]
+    if not documents:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description, actors, genres) "
+            f"VALUES (%s, %s, %s, %s, %s)",
+            documents,
+        )
+
+
+def drop_play_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("theatre_booking", "0007_performance_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_play_fts, drop_play_fts),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.0.3 on 2026-10-18 17:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("theatre_booking", "0010_reservation_tickets_user_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reservation",
+            name="expires_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="reservation",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("cart", "Cart"),
+                    ("confirmed", "Confirmed"),
+                    ("expired", "Expired"),
+                    ("cancelled", "Cancelled"),
+                ],
+                default="confirmed",
+                max_length=10,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reservation",
+            index=models.Index(
+                fields=["user", "status"], name="reservation_user_status_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reservation",
+            index=models.Index(
+                condition=models.Q(("status", "cart")),
+                fields=["expires_at"],
+                name="reservation_cart_expiry_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="reservation",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status", "cart")),
+                fields=("user",),
+                name="unique_cart_per_user",
+            ),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.3 on 2026-10-18 18:26
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+
+
+def count_seats_left(apps, schema_editor):
+    Performance = apps.get_model("theatre_booking", "Performance")
+    TheatreHall = apps.get_model("theatre_booking", "TheatreHall")
+    capacity = TheatreHall.objects.filter(pk=OuterRef("theatre_hall")).values(
+        capacity=F("rows") * F("seats_in_row")
+    )
+    Performance.objects.update(seats_left=Subquery(capacity) - F("tickets_sold"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("theatre_booking", "0011_reservation_status"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="performance",
+            name="seats_left",
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(count_seats_left, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="performance",
+            index=models.Index(
+                fields=["seats_left"], name="performance_seats_left_idx"
+            ),
+        ),
+    ]
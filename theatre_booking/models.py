@@ -1,9 +1,27 @@
-from sqlite3 import IntegrityError
+from collections import Counter
+from functools import reduce
+from operator import or_
 
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models import UniqueConstraint
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, OuterRef, Q, Subquery, UniqueConstraint
+
+
+# SQLite rejects expressions nested 1000 deep, which one OR term per seat
+# reaches at 1000 seats, so longer seat lists are queried in chunks.
+SEATS_Q_CHUNK_SIZE = 500
+
+
+def seats_q(seats):
+    return reduce(or_, (Q(row=row, seat=seat) for row, seat in seats), Q(pk__in=[]))
+
+
+def seat_chunks(seats):
+    """Split seats into lists short enough for one ``seats_q`` each."""
+    seats = list(seats)
+    for start in range(0, len(seats), SEATS_Q_CHUNK_SIZE):
+        yield seats[start : start + SEATS_Q_CHUNK_SIZE]
 
 
 class Actor(models.Model):
@@ -26,8 +44,53 @@ class Genre(models.Model):
 
 
 class Reservation(models.Model):
+    class Status(models.TextChoices):
+        CART = "cart"
+        CONFIRMED = "confirmed"
+        EXPIRED = "expired"
+        CANCELLED = "cancelled"
+
+    # Statuses each status may move to
+    TRANSITIONS = {
+        Status.CART: (Status.CONFIRMED, Status.EXPIRED, Status.CANCELLED),
+        Status.CONFIRMED: (Status.CANCELLED,),
+        Status.EXPIRED: (),
+        Status.CANCELLED: (),
+    }
+
     created_at = models.DateTimeField(auto_now_add=True)
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.CONFIRMED
+    )
+    # When an untouched cart is abandoned; unused in other statuses
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["created_at", "id"], name="reservation_created_id_idx"
+            ),
+            models.Index(
+                fields=["user", "created_at", "id"],
+                name="reservation_user_created_idx",
+            ),
+            models.Index(
+                fields=["user", "status"], name="reservation_user_status_idx"
+            ),
+            models.Index(
+                fields=["expires_at"],
+                condition=Q(status="cart"),
+                name="reservation_cart_expiry_idx",
+            ),
+        ]
+        constraints = [
+            UniqueConstraint(
+                fields=["user"],
+                condition=Q(status="cart"),
+                name="unique_cart_per_user",
+            )
+        ]
 
     def __str__(self):
         return f"Reservation of {self.user} at {self.created_at}"
@@ -42,6 +105,15 @@ class TheatreHall(models.Model):
     def capacity(self):
         return self.rows * self.seats_in_row
 
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if not adding:
+                Performance.update_seats_left(
+                    Performance.objects.filter(theatre_hall=self)
+                )
+
     def __str__(self):
         return f"{self.name} with {self.capacity} capacity"
 
@@ -60,10 +132,101 @@ class Performance(models.Model):
     play = models.ForeignKey(Play, on_delete=models.SET_NULL, null=True)
     theatre_hall = models.ForeignKey(TheatreHall, on_delete=models.SET_NULL, null=True)
     showtime = models.DateTimeField()
+    # Kept in step with Ticket rows; see adjust_tickets_sold()
+    tickets_sold = models.PositiveIntegerField(default=0)
+    # Hall capacity less tickets_sold, moved with it; null without a hall
+    seats_left = models.IntegerField(null=True, blank=True, editable=False)
+
+    # Left out of saves of existing rows; see save()
+    COUNTER_FIELDS = ("tickets_sold", "seats_left")
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["showtime", "id"], name="performance_showtime_id_idx"
+            ),
+            models.Index(
+                fields=["play", "showtime"], name="performance_play_time_idx"
+            ),
+            models.Index(
+                fields=["theatre_hall", "showtime"], name="performance_hall_time_idx"
+            ),
+            models.Index(fields=["seats_left"], name="performance_seats_left_idx"),
+        ]
 
     def __str__(self):
         return f"Performance at {self.showtime}"
 
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            hall = self.theatre_hall
+            self.seats_left = (
+                None if hall is None else hall.capacity - self.tickets_sold
+            )
+            super().save(*args, **kwargs)
+            self._loaded_theatre_hall_id = self.theatre_hall_id
+            return
+
+        # The counters move with F() updates; writing back the values this
+        # copy was loaded with would undo tickets sold or released since.
+        if kwargs.get("update_fields") is None:
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and field.name not in self.COUNTER_FIELDS
+            ]
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if self.theatre_hall_id != getattr(self, "_loaded_theatre_hall_id", None):
+                Performance.update_seats_left(Performance.objects.filter(pk=self.pk))
+        self._loaded_theatre_hall_id = self.theatre_hall_id
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_showtime = instance.__dict__.get("showtime")
+        instance._loaded_theatre_hall_id = instance.__dict__.get("theatre_hall_id")
+        return instance
+
+    @classmethod
+    def adjust_tickets_sold(cls, performance_id, delta):
+        if performance_id is not None and delta:
+            cls.objects.filter(pk=performance_id).update(
+                tickets_sold=F("tickets_sold") + delta,
+                seats_left=F("seats_left") - delta,
+            )
+
+    @classmethod
+    def update_seats_left(cls, performances):
+        """Recompute ``seats_left`` of ``performances`` in one UPDATE."""
+        capacity = TheatreHall.objects.filter(pk=OuterRef("theatre_hall")).values(
+            capacity=F("rows") * F("seats_in_row")
+        )
+        return performances.update(seats_left=Subquery(capacity) - F("tickets_sold"))
+
+
+class SeatHold(models.Model):
+    performance = models.ForeignKey(
+        Performance, on_delete=models.CASCADE, related_name="holds"
+    )
+    row = models.PositiveIntegerField()
+    seat = models.PositiveIntegerField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=["performance", "row", "seat"], name="unique_hold_for_seat"
+            )
+        ]
+
+    def __str__(self):
+        return f"Hold of row {self.row}, seat {self.seat} until {self.expires_at}"
+
 
 class Ticket(models.Model):
     row = models.PositiveIntegerField()
@@ -71,7 +234,9 @@ class Ticket(models.Model):
     performance = models.ForeignKey(
         Performance, on_delete=models.SET_NULL, null=True, related_name="tickets"
     )
-    reservation = models.ForeignKey(Reservation, on_delete=models.CASCADE)
+    reservation = models.ForeignKey(
+        Reservation, on_delete=models.CASCADE, related_name="tickets"
+    )
 
     class Meta:
         constraints = [
@@ -81,24 +246,85 @@ class Ticket(models.Model):
             )
         ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_seat = (
+            instance.__dict__.get("performance_id"),
+            instance.__dict__.get("row"),
+            instance.__dict__.get("seat"),
+        )
+        return instance
+
+    @classmethod
+    def taken_seats(cls, performance, seats, exclude=()):
+        """Return which of ``seats`` already have tickets.
+
+        One query per ``SEATS_Q_CHUNK_SIZE`` seats.
+        """
+        tickets = cls.objects.filter(performance=performance).exclude(
+            pk__in=[pk for pk in exclude if pk is not None]
+        )
+        return sorted(
+            seat
+            for chunk in seat_chunks(seats)
+            for seat in tickets.filter(seats_q(chunk)).values_list("row", "seat")
+        )
+
+    @classmethod
+    def validate_seats(cls, performance, seats, exclude=(), check_taken=True):
+        """Validate many requested ``(row, seat)`` pairs of one performance.
+
+        Returns one dict of field errors per seat, empty for a valid seat.
+        The hall is read once and taken seats are found with one query per
+        ``SEATS_Q_CHUNK_SIZE`` seats; tickets with a pk in ``exclude`` do not
+        count as taken.
+        """
+        hall = performance.theatre_hall
+        if hall is None:
+            return [{"performance": "Performance has no theatre hall"} for _ in seats]
+
+        errors = [{} for _ in seats]
+        counts = Counter(seats)
+        for error, (row, seat) in zip(errors, seats):
+            if not 1 <= row <= hall.rows:
+                error["row"] = f"Row must be between 1 and {hall.rows}"
+            if not 1 <= seat <= hall.seats_in_row:
+                error["seat"] = f"Seat must be between 1 and {hall.seats_in_row}"
+            elif counts[(row, seat)] > 1:
+                error["seat"] = "Seat is requested more than once"
+
+        if check_taken:
+            candidates = {seat for error, seat in zip(errors, seats) if not error}
+            if candidates:
+                taken = set(cls.taken_seats(performance, candidates, exclude))
+                for error, seat in zip(errors, seats):
+                    if seat in taken:
+                        error["seat"] = "Seat is already taken"
+        return errors
+
     def clean(self):
-        if self.performance:
-            if not (
-                1 <= self.row <= self.performance.theatre_hall.rows
-                and 1 <= self.seat <= self.performance.theatre_hall.seats_in_row
-            ):
-                raise ValidationError(
-                    {
-                        "seat": f"Seat must be between 1 and {self.performance.theatre_hall.seats_in_row}",
-                        "row": f"Row must be between 1 and {self.performance.theatre_hall.rows}",
-                    }
-                )
-        else:
+        if not self.performance:
             raise ValidationError("Ticket must be associated with a performance")
+        # Taken seats are caught by validating the unique constraint.
+        errors = Ticket.validate_seats(
+            self.performance, [(self.row, self.seat)], check_taken=False
+        )[0]
+        if errors:
+            raise ValidationError(errors)
 
     def save(self, *args, **kwargs):
+        adding = self._state.adding
+        loaded = getattr(self, "_loaded_seat", None)
+        previous = None if adding or loaded is None else loaded[0]
         try:
-            super().save(*args, **kwargs)
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                if adding:
+                    Performance.adjust_tickets_sold(self.performance_id, 1)
+                elif loaded is not None and previous != self.performance_id:
+                    Performance.adjust_tickets_sold(previous, -1)
+                    Performance.adjust_tickets_sold(self.performance_id, 1)
         except IntegrityError:
             raise ValidationError("Ticket is already sold")
 
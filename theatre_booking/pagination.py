@@ -0,0 +1,16 @@
+from rest_framework.pagination import CursorPagination
+
+
+class IdCursorPagination(CursorPagination):
+    ordering = ("id",)
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+
+class PerformanceCursorPagination(IdCursorPagination):
+    ordering = ("showtime", "id")
+
+
+class ReservationCursorPagination(IdCursorPagination):
+    ordering = ("-created_at", "-id")
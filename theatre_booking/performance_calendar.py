@@ -0,0 +1,125 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import router
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from theatre_booking.catalog_cache import (
+    bump_key_version,
+    catalog_cache,
+    get_key_versions,
+    get_versions,
+)
+from theatre_booking.models import Genre, Performance, Play, TheatreHall
+
+# Models whose version covers every day of the calendar. Performance's is
+# only bumped by bulk changes such as recounting sold tickets.
+CALENDAR_MODELS = (Performance, TheatreHall, Play, Genre)
+
+# Fields each grouping adds to a day, as (id, name)
+GROUPS = {
+    "hall": ("theatre_hall_id", "theatre_hall__name"),
+    "genre": ("play__genres__id", "play__genres__name"),
+}
+
+
+def local_day(value):
+    return timezone.localdate(value, timezone.get_default_timezone())
+
+
+def day_version_key(day):
+    return f"calendar-version:{day.isoformat()}"
+
+
+def empty_day(day, group_by):
+    if group_by:
+        return {"date": day.isoformat(), "groups": []}
+    return {"date": day.isoformat(), "performances": 0, "seats_left": 0}
+
+
+def aggregate_days(first, last, group_by=None):
+    """Count performances and seats left per day from ``first`` to ``last``.
+
+    Days run midnight to midnight in ``TIME_ZONE`` and are grouped in one
+    query. Returns an entry for every day in the range, keyed by date.
+    """
+    tz = timezone.get_default_timezone()
+    start = timezone.make_aware(datetime.combine(first, time()), tz)
+    end = timezone.make_aware(datetime.combine(last + timedelta(days=1), time()), tz)
+    fields = GROUPS.get(group_by, ())
+    # Cached entries outlive the replicas' lag, so read the primary.
+    rows = (
+        Performance.objects.db_manager(router.db_for_write(Performance))
+        .filter(showtime__gte=start, showtime__lt=end)
+        .annotate(day=TruncDate("showtime", tzinfo=tz))
+        .values("day", *fields)
+        .annotate(
+            performances=Count("id"),
+            seats_left=Coalesce(Sum("seats_left"), 0),
+        )
+        .order_by("day", *fields)
+    )
+
+    days = {}
+    for offset in range((last - first).days + 1):
+        day = first + timedelta(days=offset)
+        days[day] = empty_day(day, group_by)
+    for row in rows:
+        entry = days[row["day"]]
+        counts = {
+            "performances": row["performances"],
+            "seats_left": row["seats_left"],
+        }
+        if group_by:
+            id_field, name_field = fields
+            entry["groups"].append(
+                {"id": row[id_field], "name": row[name_field], **counts}
+            )
+        else:
+            entry.update(counts)
+    return days
+
+
+def performance_calendar(first, days, group_by=None):
+    """Per-day aggregates for ``days`` days from ``first``, cached per day.
+
+    Each day is cached under its own version, which changes when one of
+    its performances or their tickets change, and the versions of the
+    catalog models. Days missing from the cache are computed together in
+    one query.
+    """
+    dates = [first + timedelta(days=offset) for offset in range(days)]
+    catalog = ".".join(str(version) for version in get_versions(CALENDAR_MODELS))
+    day_versions = get_key_versions([day_version_key(day) for day in dates])
+    keys = {
+        day: f"calendar:{catalog}:{version}:{group_by or 'day'}:{day.isoformat()}"
+        for day, version in zip(dates, day_versions)
+    }
+
+    cache = catalog_cache()
+    entries = cache.get_many(keys.values())
+    missing = [day for day in dates if keys[day] not in entries]
+    if missing:
+        fresh = aggregate_days(missing[0], missing[-1], group_by)
+        computed = {keys[day]: fresh[day] for day in missing}
+        cache.set_many(computed, settings.PERFORMANCE_CALENDAR["CACHE_TIMEOUT"])
+        entries.update(computed)
+    return [entries[keys[day]] for day in dates]
+
+
+def invalidate_days(showtimes):
+    for day in {local_day(showtime) for showtime in showtimes if showtime}:
+        bump_key_version(day_version_key(day))
+
+
+def invalidate_performance_days(performance_ids):
+    """Invalidate the calendar days of performances whose tickets changed."""
+    performance_ids = [pk for pk in performance_ids if pk is not None]
+    if performance_ids:
+        invalidate_days(
+            Performance.objects.db_manager(router.db_for_write(Performance))
+            .filter(pk__in=performance_ids)
+            .values_list("showtime", flat=True)
+        )
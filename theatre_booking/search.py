@@ -0,0 +1,129 @@
+import re
+from functools import reduce
+from operator import and_, or_
+
+from django.db import OperationalError, connection
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from theatre_booking.models import Play
+
+FTS_TABLE = "theatre_booking_play_fts"
+
+# bm25 column weights: title, description, actors, genres
+FTS_WEIGHTS = (10.0, 1.0, 5.0, 3.0)
+
+
+def search_terms(query):
+    return re.findall(r"\w+", query)
+
+
+def fts_available():
+    """True when the FTS5 table exists (SQLite built with FTS5 support)."""
+    if connection.vendor != "sqlite":
+        return False
+    available = getattr(connection, "play_fts_available", None)
+    if available is None:
+        available = FTS_TABLE in connection.introspection.table_names()
+        connection.play_fts_available = available
+    return available
+
+
+def play_documents(play_ids):
+    plays = Play.objects.filter(id__in=play_ids).prefetch_related("actors", "genres")
+    for play in plays:
+        yield (
+            play.id,
+            play.title,
+            play.description,
+            " ".join(actor.full_name for actor in play.actors.all()),
+            " ".join(genre.name for genre in play.genres.all()),
+        )
+
+
+def remove_plays(play_ids):
+    if not fts_available() or not play_ids:
+        return
+    placeholders = ", ".join(["%s"] * len(play_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})",
+            list(play_ids),
+        )
+
+
+def index_plays(play_ids):
+    if not fts_available() or not play_ids:
+        return
+    remove_plays(play_ids)
+    documents = list(play_documents(play_ids))
+    if not documents:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description, actors, genres) "
+            f"VALUES (%s, %s, %s, %s, %s)",
+            documents,
+        )
+
+
+def fts_search(terms, limit):
+    match = " ".join(f'"{term}"*' for term in terms)
+    weights = ", ".join(str(weight) for weight in FTS_WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s",
+            [match, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def fallback_search(terms, limit):
+    def term_q(term):
+        return (
+            Q(title__icontains=term)
+            | Q(description__icontains=term)
+            | Q(actors__first_name__icontains=term)
+            | Q(actors__last_name__icontains=term)
+            | Q(genres__name__icontains=term)
+        )
+
+    title_match = reduce(or_, (Q(title__icontains=term) for term in terms))
+    plays = (
+        Play.objects.filter(reduce(and_, (term_q(term) for term in terms)))
+        .annotate(
+            rank=Case(
+                When(title_match, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        )
+        .order_by("-rank", "id")
+        .values_list("id", flat=True)
+        .distinct()
+    )
+    return list(plays[:limit])
+
+
+def search_play_ids(query, limit=50):
+    """Return ids of plays matching every word of ``query``, best first."""
+    terms = search_terms(query)
+    if not terms:
+        return []
+    if fts_available():
+        try:
+            return fts_search(terms, limit)
+        except OperationalError:
+            pass
+    return fallback_search(terms, limit)
+
+
+def order_by_ids(queryset, ids):
+    if not ids:
+        return queryset.none()
+    return queryset.filter(id__in=ids).order_by(
+        Case(
+            *(When(id=pk, then=Value(position)) for position, pk in enumerate(ids)),
+            output_field=IntegerField(),
+        )
+    )
@@ -0,0 +1,186 @@
+import base64
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+
+from theatre_booking.models import Ticket
+
+
+def seat_map_cache_key(performance_id, version):
+    return f"seat-map:{performance_id}:{version}"
+
+
+def seat_map_version_key(performance_id):
+    return f"seat-map-version:{performance_id}"
+
+
+def seat_map_version(performance_id):
+    key = seat_map_version_key(performance_id)
+    version = cache.get(key)
+    if version is None:
+        # Time based, so an evicted counter does not revive old maps.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+async def aseat_map_version(performance_id):
+    key = seat_map_version_key(performance_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), None)
+        version = await cache.aget(key)
+    return version
+
+
+def next_seat_map_version(performance_id):
+    try:
+        return cache.incr(seat_map_version_key(performance_id))
+    except ValueError:
+        version = time.time_ns()
+        cache.set(seat_map_version_key(performance_id), version, None)
+        return version
+
+
+class SeatMap:
+    """Row-major occupancy bitmap of a hall, one bit per seat (1 = taken).
+
+    Seat ``(row, seat)`` is bit ``(row - 1) * seats_in_row + (seat - 1)``,
+    stored most significant bit first inside each byte.
+    """
+
+    encoding = "bitset-base64"
+
+    def __init__(self, rows, seats_in_row, bits=None):
+        self.rows = rows
+        self.seats_in_row = seats_in_row
+        if bits is None:
+            bits = bytearray((rows * seats_in_row + 7) // 8)
+        self.bits = bits
+
+    @property
+    def capacity(self):
+        return self.rows * self.seats_in_row
+
+    @property
+    def taken_count(self):
+        return int.from_bytes(self.bits, "big").bit_count()
+
+    def _index(self, row, seat):
+        if not (1 <= row <= self.rows and 1 <= seat <= self.seats_in_row):
+            return None
+        return (row - 1) * self.seats_in_row + (seat - 1)
+
+    def is_taken(self, row, seat):
+        index = self._index(row, seat)
+        if index is None:
+            return False
+        return bool(self.bits[index >> 3] & (0x80 >> (index & 7)))
+
+    def mark(self, row, seat, taken=True):
+        index = self._index(row, seat)
+        if index is None:
+            return
+        if taken:
+            self.bits[index >> 3] |= 0x80 >> (index & 7)
+        else:
+            self.bits[index >> 3] &= ~(0x80 >> (index & 7)) & 0xFF
+
+    def dump(self):
+        return self.rows, self.seats_in_row, bytes(self.bits)
+
+    @classmethod
+    def load(cls, value):
+        rows, seats_in_row, bits = value
+        return cls(rows, seats_in_row, bytearray(bits))
+
+    def to_representation(self):
+        return {
+            "rows": self.rows,
+            "seats_in_row": self.seats_in_row,
+            "available_seats": self.capacity - self.taken_count,
+            "encoding": self.encoding,
+            "taken": base64.b64encode(self.bits).decode("ascii"),
+        }
+
+
+def hall_dimensions(performance):
+    hall = performance.theatre_hall
+    return (hall.rows, hall.seats_in_row) if hall else (0, 0)
+
+
+def taken_seats(performance):
+    # Cached maps are only patched after they are built, so they are built
+    # from the primary rather than from a replica that may lag behind it.
+    return (
+        Ticket.objects.db_manager(router.db_for_write(Ticket))
+        .filter(performance_id=performance.pk)
+        .values_list("row", "seat")
+    )
+
+
+def build_seat_map(performance):
+    seat_map = SeatMap(*hall_dimensions(performance))
+    for row, seat in taken_seats(performance).iterator():
+        seat_map.mark(row, seat)
+    return seat_map
+
+
+def get_seat_map(performance):
+    """Return the cached seat map of a performance, building it if missing.
+
+    The version is read before the tickets, so a map built from tickets
+    that miss a change is stored under a version that change has already
+    replaced.
+    """
+    key = seat_map_cache_key(performance.pk, seat_map_version(performance.pk))
+    cached = cache.get(key)
+    if cached is not None and tuple(cached[:2]) == hall_dimensions(performance):
+        return SeatMap.load(cached)
+
+    seat_map = build_seat_map(performance)
+    cache.set(key, seat_map.dump(), settings.SEAT_MAP_CACHE_TIMEOUT)
+    return seat_map
+
+
+async def aget_seat_map(performance):
+    """Async ``get_seat_map``; ``performance.theatre_hall`` must be loaded."""
+    key = seat_map_cache_key(performance.pk, await aseat_map_version(performance.pk))
+    cached = await cache.aget(key)
+    if cached is not None and tuple(cached[:2]) == hall_dimensions(performance):
+        return SeatMap.load(cached)
+
+    seat_map = SeatMap(*hall_dimensions(performance))
+    async for row, seat in taken_seats(performance):
+        seat_map.mark(row, seat)
+    await cache.aset(key, seat_map.dump(), settings.SEAT_MAP_CACHE_TIMEOUT)
+    return seat_map
+
+
+def mark_seats(performance_id, seats, taken=True):
+    """Apply a committed ticket change to the cached seat map.
+
+    Each change takes a new version with an atomic ``incr`` and patches
+    the map of the version just before it into its own. When that map is
+    missing, e.g. because the change before has not stored it yet, the
+    map is left to be rebuilt from the tickets on the next read, so
+    concurrent changes never overwrite each other's seats.
+    """
+    version = next_seat_map_version(performance_id)
+    cached = cache.get(seat_map_cache_key(performance_id, version - 1))
+    if cached is None:
+        return
+    seat_map = SeatMap.load(cached)
+    for row, seat in seats:
+        seat_map.mark(row, seat, taken=taken)
+    cache.set(
+        seat_map_cache_key(performance_id, version),
+        seat_map.dump(),
+        settings.SEAT_MAP_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_seat_map(performance_id):
+    next_seat_map_version(performance_id)
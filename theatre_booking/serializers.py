@@ -1,5 +1,9 @@
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
 
+from theatre_booking.allocation import allocate_seats
+from theatre_booking.booking import book_seats, find_held_seats
 from theatre_booking.models import (
     Actor,
     Genre,
@@ -31,8 +35,8 @@ class ReservationSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Reservation
-        fields = ("id", "created_at", "user")
-        read_only_fields = ("id", "created_at")
+        fields = ("id", "created_at", "user", "status")
+        read_only_fields = ("id", "created_at", "status")
 
 
 class TheatreHallSerializer(serializers.ModelSerializer):
@@ -68,14 +72,109 @@ class PerformanceSerializer(serializers.ModelSerializer):
 class PerformanceListSerializer(PerformanceSerializer):
 
     play = PlaySerializer(read_only=True)
+    tickets_sold = serializers.IntegerField(read_only=True)
+    capacity = serializers.IntegerField(read_only=True)
+    available_seats = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Performance
+        fields = (
+            "id",
+            "play",
+            "theatre_hall",
+            "showtime",
+            "tickets_sold",
+            "capacity",
+            "available_seats",
+        )
+
+
+class PerformanceFilterSerializer(serializers.Serializer):
+    showtime__gte = serializers.DateTimeField(required=False)
+    showtime__lte = serializers.DateTimeField(required=False)
+    play = serializers.IntegerField(required=False, min_value=1)
+    theatre_hall = serializers.IntegerField(required=False, min_value=1)
+    play__genres = serializers.IntegerField(required=False, min_value=1)
+    available = serializers.BooleanField(required=False, allow_null=True, default=None)
+    min_seats = serializers.IntegerField(required=False, min_value=1)
+
+
+class CalendarFilterSerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    days = serializers.IntegerField(required=False, min_value=1)
+    group_by = serializers.ChoiceField(choices=("hall", "genre"), required=False)
+
+    def validate_days(self, value):
+        limit = settings.PERFORMANCE_CALENDAR["MAX_DAYS"]
+        if value > limit:
+            raise serializers.ValidationError(
+                f"Ensure this value is less than or equal to {limit}."
+            )
+        return value
+
+    def validate(self, attrs):
+        today = timezone.localdate(timezone=timezone.get_default_timezone())
+        attrs.setdefault("start", today)
+        attrs.setdefault("days", settings.PERFORMANCE_CALENDAR["DAYS"])
+        horizon = settings.PERFORMANCE_CALENDAR["HORIZON_DAYS"]
+        # Offsets from today, as adding to a far off start may overflow
+        first = (attrs["start"] - today).days
+        if first < -horizon or first + attrs["days"] - 1 > horizon:
+            raise serializers.ValidationError(
+                {"start": f"All days must be within {horizon} days of today."}
+            )
+        return attrs
+
+
+class ExportFilterSerializer(serializers.Serializer):
+    file_format = serializers.ChoiceField(choices=("csv", "ndjson"), default="csv")
+
+
+class TicketExportFilterSerializer(ExportFilterSerializer):
+    performance = serializers.IntegerField(required=False, min_value=1)
+    play = serializers.IntegerField(required=False, min_value=1)
+    showtime__gte = serializers.DateTimeField(required=False)
+    showtime__lte = serializers.DateTimeField(required=False)
+
+
+class ReservationExportFilterSerializer(ExportFilterSerializer):
+    created_at__gte = serializers.DateTimeField(required=False)
+    created_at__lte = serializers.DateTimeField(required=False)
+    user = serializers.IntegerField(required=False, min_value=1)
 
 
 class TicketSerializer(serializers.ModelSerializer):
+    performance = serializers.PrimaryKeyRelatedField(
+        queryset=Performance.objects.select_related("theatre_hall"),
+        allow_null=True,
+        required=False,
+    )
 
     class Meta:
         model = Ticket
         fields = ("id", "row", "seat", "performance", "reservation")
         read_only_fields = ("id", "reservation")
+        # Ticket.validate_seats covers the unique constraint.
+        validators = []
+
+    def validate(self, attrs):
+        request = self.context.get("request")
+        performance = attrs.get(
+            "performance", getattr(self.instance, "performance", None)
+        )
+        row = attrs.get("row", getattr(self.instance, "row", None))
+        seat = attrs.get("seat", getattr(self.instance, "seat", None))
+        if performance is None or row is None or seat is None:
+            return attrs
+
+        errors = Ticket.validate_seats(
+            performance, [(row, seat)], exclude=[getattr(self.instance, "pk", None)]
+        )[0]
+        if errors:
+            raise serializers.ValidationError(errors)
+        if request and find_held_seats(performance, [(row, seat)], request.user):
+            raise serializers.ValidationError("Seat is held by another customer")
+        return attrs
 
 
 class PerformanceDetailSerializer(PerformanceSerializer):
@@ -83,13 +182,140 @@ class PerformanceDetailSerializer(PerformanceSerializer):
     theatre_hall = TheatreHallSerializer(read_only=True)
     available_seats = serializers.SerializerMethodField()
 
-    def get_available_seats(self, obj):
-        sold_tickets_count = Ticket.objects.filter(performance=obj).count()
-        total_seats = obj.theatre_hall.capacity
-        available_seats = total_seats - sold_tickets_count
+    tickets_sold = serializers.IntegerField(read_only=True)
+    capacity = serializers.IntegerField(read_only=True)
 
+    def get_available_seats(self, obj):
+        available_seats = obj.available_seats
         return available_seats if available_seats else "Sold out!"
 
     class Meta:
         model = Performance
-        fields = ("id", "play", "theatre_hall", "showtime", "available_seats")
+        fields = (
+            "id",
+            "play",
+            "theatre_hall",
+            "showtime",
+            "tickets_sold",
+            "capacity",
+            "available_seats",
+        )
+
+
+class SeatSerializer(serializers.Serializer):
+    row = serializers.IntegerField(min_value=1)
+    seat = serializers.IntegerField(min_value=1)
+
+
+class ReservationTicketsSerializer(ReservationSerializer):
+    tickets = TicketSerializer(many=True, read_only=True)
+
+    class Meta(ReservationSerializer.Meta):
+        fields = ("id", "created_at", "user", "status", "tickets")
+        read_only_fields = ("id", "created_at", "user", "status")
+
+
+class TicketPerformanceSerializer(serializers.ModelSerializer):
+    play = serializers.CharField(source="play.title", read_only=True, allow_null=True)
+    theatre_hall = serializers.CharField(
+        source="theatre_hall.name", read_only=True, allow_null=True
+    )
+
+    class Meta:
+        model = Performance
+        fields = ("id", "showtime", "play", "theatre_hall")
+
+
+class ReservationTicketDetailSerializer(serializers.ModelSerializer):
+    performance = TicketPerformanceSerializer(read_only=True)
+
+    class Meta:
+        model = Ticket
+        fields = ("id", "row", "seat", "performance")
+
+
+class ReservationHistorySerializer(ReservationSerializer):
+    tickets = ReservationTicketDetailSerializer(many=True, read_only=True)
+
+    class Meta(ReservationSerializer.Meta):
+        fields = ("id", "created_at", "status", "tickets")
+
+
+class SeatListSerializer(serializers.Serializer):
+    tickets = SeatSerializer(
+        many=True, allow_empty=False, max_length=settings.BOOKING_MAX_SEATS
+    )
+
+    def get_performance(self, attrs):
+        return self.context["performance"]
+
+    def validate(self, attrs):
+        hall = self.get_performance(attrs).theatre_hall
+        if hall is None:
+            raise serializers.ValidationError(
+                {"performance": "Performance has no theatre hall"}
+            )
+
+        seats = [(ticket["row"], ticket["seat"]) for ticket in attrs["tickets"]]
+        # Taken seats are reported by booking and holds as conflicts.
+        errors = Ticket.validate_seats(
+            self.get_performance(attrs), seats, check_taken=False
+        )
+        if any(errors):
+            raise serializers.ValidationError({"tickets": errors})
+
+        attrs["seats"] = seats
+        return attrs
+
+
+class SeatHoldSerializer(SeatListSerializer):
+    expires_at = serializers.DateTimeField(read_only=True)
+
+
+class BookingSerializer(SeatListSerializer):
+    performance = serializers.PrimaryKeyRelatedField(
+        queryset=Performance.objects.select_related("theatre_hall")
+    )
+
+    def get_performance(self, attrs):
+        return attrs["performance"]
+
+    def create(self, validated_data):
+        return book_seats(
+            validated_data["user"],
+            validated_data["performance"],
+            validated_data["seats"],
+        )
+
+
+class AllocationSerializer(serializers.Serializer):
+    performance = serializers.PrimaryKeyRelatedField(
+        queryset=Performance.objects.select_related("theatre_hall")
+    )
+    count = serializers.IntegerField(min_value=1)
+
+    def validate_count(self, value):
+        limit = settings.SEAT_ALLOCATION["MAX_SEATS"]
+        if value > limit:
+            raise serializers.ValidationError(
+                f"Ensure this value is less than or equal to {limit}."
+            )
+        return value
+
+    def create(self, validated_data):
+        return allocate_seats(
+            validated_data["user"],
+            validated_data["performance"],
+            validated_data["count"],
+        )
+
+
+class ScheduleImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    file_format = serializers.ChoiceField(choices=("csv", "ndjson"), required=False)
+
+    def validate(self, attrs):
+        if "file_format" not in attrs:
+            name = attrs["file"].name or ""
+            attrs["file_format"] = "csv" if name.endswith(".csv") else "ndjson"
+        return attrs
@@ -0,0 +1,171 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from theatre_booking.catalog_cache import bump_version
+from theatre_booking.events import publish_seats
+from theatre_booking.models import (
+    Actor,
+    Genre,
+    Performance,
+    Play,
+    TheatreHall,
+    Ticket,
+)
+from theatre_booking.performance_calendar import (
+    invalidate_days,
+    invalidate_performance_days,
+)
+from theatre_booking.search import index_plays, remove_plays
+from theatre_booking.seat_map import mark_seats
+
+# Set while a bulk ticket operation updates counters and seat maps itself
+ticket_signals_muted = ContextVar("ticket_signals_muted", default=False)
+
+
+@contextmanager
+def mute_ticket_signals():
+    token = ticket_signals_muted.set(True)
+    try:
+        yield
+    finally:
+        ticket_signals_muted.reset(token)
+
+
+@receiver(post_save, sender=Ticket)
+def update_seat_map_on_ticket_save(sender, instance, created, **kwargs):
+    if ticket_signals_muted.get():
+        return
+    current = (instance.performance_id, instance.row, instance.seat)
+    previous = None if created else getattr(instance, "_loaded_seat", None)
+    instance._loaded_seat = current
+    if previous == current:
+        return
+
+    def update():
+        if previous and previous[0] is not None:
+            mark_seats(previous[0], [previous[1:]], taken=False)
+            publish_seats(previous[0], [previous[1:]], taken=False)
+        if current[0] is not None:
+            mark_seats(current[0], [current[1:]], taken=True)
+            publish_seats(current[0], [current[1:]], taken=True)
+        if not previous or previous[0] != current[0]:
+            invalidate_performance_days([previous and previous[0], current[0]])
+
+    transaction.on_commit(update)
+
+
+@receiver(post_delete, sender=Ticket)
+def decrement_tickets_sold(sender, instance, **kwargs):
+    if ticket_signals_muted.get():
+        return
+    # Runs inside the deletion's transaction.
+    Performance.adjust_tickets_sold(instance.performance_id, -1)
+
+
+@receiver(pre_delete, sender=TheatreHall)
+def clear_seats_left_of_hall(sender, instance, **kwargs):
+    # Its performances are left without a hall and so without seats.
+    Performance.objects.filter(theatre_hall=instance).update(seats_left=None)
+
+
+@receiver(post_delete, sender=Ticket)
+def update_seat_map_on_ticket_delete(sender, instance, **kwargs):
+    if ticket_signals_muted.get() or instance.performance_id is None:
+        return
+    seat = (instance.row, instance.seat)
+
+    def update():
+        mark_seats(instance.performance_id, [seat], taken=False)
+        publish_seats(instance.performance_id, [seat], taken=False)
+        invalidate_performance_days([instance.performance_id])
+
+    transaction.on_commit(update)
+
+
+@receiver(post_save, sender=Performance)
+def invalidate_calendar_on_performance_save(sender, instance, **kwargs):
+    showtimes = [instance.showtime, getattr(instance, "_loaded_showtime", None)]
+    instance._loaded_showtime = instance.showtime
+    transaction.on_commit(lambda: invalidate_days(showtimes))
+
+
+@receiver(post_delete, sender=Performance)
+def invalidate_calendar_on_performance_delete(sender, instance, **kwargs):
+    showtime = instance.showtime
+    transaction.on_commit(lambda: invalidate_days([showtime]))
+
+
+@receiver(post_save, sender=Actor)
+@receiver(post_delete, sender=Actor)
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+@receiver(post_save, sender=TheatreHall)
+@receiver(post_delete, sender=TheatreHall)
+@receiver(post_save, sender=Play)
+@receiver(post_delete, sender=Play)
+def invalidate_catalog_cache(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version(sender))
+
+
+@receiver(m2m_changed, sender=Play.actors.through)
+@receiver(m2m_changed, sender=Play.genres.through)
+def invalidate_catalog_cache_on_play_links(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        transaction.on_commit(lambda: bump_version(Play))
+
+
+def reindex_plays_on_commit(play_ids):
+    play_ids = list(play_ids)
+    if play_ids:
+        transaction.on_commit(lambda: index_plays(play_ids))
+
+
+@receiver(post_save, sender=Play)
+def index_play(sender, instance, **kwargs):
+    reindex_plays_on_commit([instance.pk])
+
+
+@receiver(post_delete, sender=Play)
+def unindex_play(sender, instance, **kwargs):
+    play_id = instance.pk
+    transaction.on_commit(lambda: remove_plays([play_id]))
+
+
+@receiver(post_save, sender=Actor)
+@receiver(post_save, sender=Genre)
+def reindex_plays_of_credit(sender, instance, created, **kwargs):
+    if not created:
+        field = "actors" if sender is Actor else "genres"
+        reindex_plays_on_commit(
+            Play.objects.filter(**{field: instance}).values_list("id", flat=True)
+        )
+
+
+@receiver(pre_delete, sender=Actor)
+@receiver(pre_delete, sender=Genre)
+def reindex_plays_of_deleted_credit(sender, instance, **kwargs):
+    # Link rows go away with the cascade without an m2m_changed signal.
+    field = "actors" if sender is Actor else "genres"
+    reindex_plays_on_commit(
+        Play.objects.filter(**{field: instance}).values_list("id", flat=True)
+    )
+
+
+@receiver(m2m_changed, sender=Play.actors.through)
+@receiver(m2m_changed, sender=Play.genres.through)
+def reindex_plays_on_links(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        reindex_plays_on_commit([instance.pk])
+    elif action == "pre_clear":
+        field = "actors" if sender is Play.actors.through else "genres"
+        reindex_plays_on_commit(
+            Play.objects.filter(**{field: instance}).values_list("id", flat=True)
+        )
+    else:
+        reindex_plays_on_commit(pk_set)
@@ -0,0 +1,134 @@
+import csv
+import json
+from datetime import datetime
+
+from django.http import StreamingHttpResponse
+from drf_spectacular.utils import extend_schema
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
+
+from theatre_service.renderers import OrjsonRenderer
+
+
+class StreamingListMixin:
+    """Staff-only ``stream/`` action returning the whole list as a JSON array.
+
+    Rows are read with a server-side iterator and serialized in chunks, so
+    memory stays flat however long the history is.
+    """
+
+    stream_chunk_size = 500
+
+    def stream_rows(self, queryset):
+        serializer_class = self.get_serializer_class()
+        context = self.get_serializer_context()
+        renderer = OrjsonRenderer()
+        chunk = []
+
+        yield b"["
+        separator = b""
+        for instance in queryset.iterator(chunk_size=self.stream_chunk_size):
+            chunk.append(instance)
+            if len(chunk) < self.stream_chunk_size:
+                continue
+            for item in serializer_class(chunk, many=True, context=context).data:
+                yield separator + renderer.render(item)
+                separator = b","
+            chunk = []
+        for item in serializer_class(chunk, many=True, context=context).data:
+            yield separator + renderer.render(item)
+            separator = b","
+        yield b"]"
+
+    @extend_schema(description="Stream the full list as one JSON array (staff only)")
+    @action(detail=False, methods=["get"], permission_classes=[IsAdminUser])
+    def stream(self, request):
+        queryset = self.filter_queryset(self.get_queryset()).order_by(
+            *self.pagination_class.ordering
+        )
+        return StreamingHttpResponse(
+            self.stream_rows(queryset), content_type="application/json"
+        )
+
+
+class LineBuffer:
+    """File-like target for ``csv.writer`` that hands back each line."""
+
+    def write(self, value):
+        return value
+
+
+def export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def csv_lines(columns, rows, chunk_size):
+    writer = csv.writer(LineBuffer())
+    chunk = [writer.writerow(columns)]
+    for row in rows:
+        chunk.append(writer.writerow([export_value(value) for value in row]))
+        if len(chunk) >= chunk_size:
+            yield "".join(chunk).encode()
+            chunk = []
+    yield "".join(chunk).encode()
+
+
+def ndjson_lines(columns, rows, chunk_size):
+    chunk = []
+    for row in rows:
+        record = dict(zip(columns, (export_value(value) for value in row)))
+        chunk.append(json.dumps(record) + "\n")
+        if len(chunk) >= chunk_size:
+            yield "".join(chunk).encode()
+            chunk = []
+    yield "".join(chunk).encode()
+
+
+EXPORT_FORMATS = {
+    "csv": (csv_lines, "text/csv"),
+    "ndjson": (ndjson_lines, "application/x-ndjson"),
+}
+
+
+class ExportMixin:
+    """Staff-only ``export/`` action streaming flat rows as CSV or NDJSON.
+
+    ``export_fields`` maps output columns to ``values_list`` lookups, so rows
+    come straight from the cursor as tuples without building model
+    instances, and the first bytes are sent while the query is still being
+    read.
+    """
+
+    export_chunk_size = 2000
+    export_fields = {}
+    export_filter_serializer_class = None
+    export_filter_lookups = {}
+
+    def get_export_queryset(self, filters):
+        lookups = {
+            self.export_filter_lookups.get(name, name): value
+            for name, value in filters.items()
+        }
+        return self.queryset.model.objects.filter(**lookups).order_by("pk")
+
+    @extend_schema(description="Stream matching rows as CSV or NDJSON (staff only)")
+    @action(detail=False, methods=["get"], permission_classes=[IsAdminUser])
+    def export(self, request):
+        serializer = self.export_filter_serializer_class(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        filters = dict(serializer.validated_data)
+        file_format = filters.pop("file_format")
+        write_lines, content_type = EXPORT_FORMATS[file_format]
+
+        rows = (
+            self.get_export_queryset(filters)
+            .values_list(*self.export_fields.values())
+            .iterator(chunk_size=self.export_chunk_size)
+        )
+        response = StreamingHttpResponse(
+            write_lines(list(self.export_fields), rows, self.export_chunk_size),
+            content_type=content_type,
+        )
+        filename = f"{self.queryset.model._meta.model_name}s.{file_format}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
@@ -1,9 +1,32 @@
+import asyncio
+import base64
+import csv
+import json
+import os
+import random
+import shutil
+import tempfile
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+import msgpack
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
 from django.core.exceptions import ValidationError
-from django.test import TestCase, Client
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, OperationalError, connection
+from django.test import SimpleTestCase, TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase, APIRequestFactory, force_authenticate
 from rest_framework_simplejwt.tokens import AccessToken
 
@@ -15,7 +38,24 @@ from theatre_booking.models import (
     Play,
     Performance,
     Ticket,
+    SeatHold,
+)
+from theatre_service.db_routers import ReplicaRouter
+from theatre_service.renderers import OrjsonRenderer
+from theatre_service.replicas import use_replica
+from theatre_service.transactions import contended_write, transaction_mode
+from theatre_service.throttling import (
+    SlidingWindowScopedRateThrottle,
+    SlidingWindowUserRateThrottle,
 )
+from .allocation import SeatAllocator
+from .benchmarks import seed_dataset
+from .booking import book_seats, sweep_expired_holds
+from .events import SEATS_RELEASED, Broadcaster, CacheBackend, snapshot_event
+from .management.commands.bench import Command as BenchCommand
+from .search import fallback_search
+from .seat_map import SeatMap, get_seat_map, mark_seats
+from .signals import mute_ticket_signals
 from .serializers import (
     GenreSerializer,
     ActorSerializer,
@@ -28,6 +68,7 @@ from .views import (
     GenreViewSet,
     TheatreHallViewSet,
     PlayViewSet,
+    PerformanceViewSet,
     TicketViewSet,
 )
 
@@ -110,6 +151,33 @@ class AdminPanelTestCase(TestCase):
             ).exists()
         )
 
+    def test_reservation_inline_validates_seats(self):
+        self.client.login(username=self.admin_username, password=self.admin_password)
+        response = self.client.post(
+            reverse(
+                "admin:theatre_booking_reservation_change",
+                args=(self.reservation.id,),
+            ),
+            {
+                "user": self.admin_user.id,
+                "status": "confirmed",
+                "tickets-TOTAL_FORMS": "2",
+                "tickets-INITIAL_FORMS": "1",
+                "tickets-0-id": self.ticket.id,
+                "tickets-0-reservation": self.reservation.id,
+                "tickets-0-row": "5",
+                "tickets-0-seat": "10",
+                "tickets-0-performance": self.performance.id,
+                "tickets-1-reservation": self.reservation.id,
+                "tickets-1-row": "11",
+                "tickets-1-seat": "1",
+                "tickets-1-performance": self.performance.id,
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Row must be between 1 and 10")
+        self.assertEqual(Ticket.objects.count(), 1)
+
     def test_delete_objects_via_admin(self):
         self.client.login(username=self.admin_username, password=self.admin_password)
 
@@ -192,6 +260,43 @@ class ModelsTestCase(TestCase):
         )
         self.assertRaises(ValidationError, ticket_without_performance.clean)
 
+    def test_ticket_full_clean_taken_seat(self):
+        taken = Ticket(
+            row=5, seat=10, performance=self.performance, reservation=self.reservation
+        )
+        self.assertRaises(ValidationError, taken.full_clean)
+        self.ticket.full_clean()
+
+    def test_ticket_save_taken_seat(self):
+        with self.assertRaisesMessage(ValidationError, "Ticket is already sold"):
+            Ticket.objects.create(
+                row=5,
+                seat=10,
+                performance=self.performance,
+                reservation=self.reservation,
+            )
+
+    def test_validate_seats_in_two_queries(self):
+        performance = Performance.objects.get(id=self.performance.id)
+        seats = [(row, seat) for row in range(1, 6) for seat in range(6, 16)]
+        seats += [(16, 1), (1, 16), (1, 6)]
+        with self.assertNumQueries(2):
+            errors = Ticket.validate_seats(performance, seats)
+        self.assertEqual(len(errors), len(seats))
+        self.assertEqual(
+            errors[seats.index((5, 10))], {"seat": "Seat is already taken"}
+        )
+        self.assertEqual(errors[-3], {"row": "Row must be between 1 and 15"})
+        self.assertEqual(errors[-2], {"seat": "Seat must be between 1 and 15"})
+        self.assertEqual(errors[0], {"seat": "Seat is requested more than once"})
+        self.assertEqual(sum(1 for error in errors if error), 5)
+
+    def test_taken_seats_of_a_long_list_in_chunks(self):
+        seats = [(row, seat) for row in range(1, 41) for seat in range(1, 31)]
+        with self.assertNumQueries(3):
+            taken = Ticket.taken_seats(self.performance, seats)
+        self.assertEqual(taken, [(5, 10)])
+
 
 class ViewsTestCase(APITestCase):
     def setUp(self):
@@ -298,3 +403,1641 @@ class TestPerformanceSerializer(TestCase):
         }
         serializer = PerformanceSerializer(data=data)
         self.assertTrue(serializer.is_valid())
+
+
+class SeatMapTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.hall = TheatreHall.objects.create(
+            name="Small Hall", rows=2, seats_in_row=5
+        )
+        self.play = Play.objects.create(title="Hamlet", description="Tragedy")
+        self.performance = Performance.objects.create(
+            play=self.play, theatre_hall=self.hall, showtime=timezone.now()
+        )
+        self.reservation = Reservation.objects.create(user=self.user)
+        Ticket.objects.create(
+            row=1, seat=2, performance=self.performance, reservation=self.reservation
+        )
+        self.url = reverse(
+            "theatre_service:performance-seats", args=[self.performance.id]
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def get_taken(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.data, base64.b64decode(response.data["taken"])
+
+    def test_seat_map_bitmap(self):
+        data, taken = self.get_taken()
+        self.assertEqual(data["rows"], 2)
+        self.assertEqual(data["seats_in_row"], 5)
+        self.assertEqual(data["available_seats"], 9)
+        self.assertEqual(taken, bytes([0b01000000, 0]))
+
+    def test_seat_map_cache_follows_ticket_changes(self):
+        self.get_taken()
+        with self.captureOnCommitCallbacks(execute=True):
+            ticket = Ticket.objects.create(
+                row=2,
+                seat=5,
+                performance=self.performance,
+                reservation=self.reservation,
+            )
+        with self.assertNumQueries(1):
+            data, taken = self.get_taken()
+        self.assertEqual(taken, bytes([0b01000000, 0b01000000]))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ticket.delete()
+        data, taken = self.get_taken()
+        self.assertEqual(data["available_seats"], 9)
+        self.assertEqual(taken, bytes([0b01000000, 0]))
+
+    def test_interleaved_marks_keep_both_seats(self):
+        get_seat_map(self.performance)
+        with mute_ticket_signals():
+            for seat in (3, 4):
+                Ticket.objects.create(
+                    row=1,
+                    seat=seat,
+                    performance=self.performance,
+                    reservation=self.reservation,
+                )
+
+        cache_get = cache.get
+        interleaved = []
+
+        def get(key, *args, **kwargs):
+            value = cache_get(key, *args, **kwargs)
+            # The second change runs between the first one's read and write.
+            if key.startswith("seat-map:") and not interleaved:
+                interleaved.append(key)
+                mark_seats(self.performance.id, [(1, 4)])
+            return value
+
+        with mock.patch.object(cache, "get", side_effect=get):
+            mark_seats(self.performance.id, [(1, 3)])
+        data, taken = self.get_taken()
+        self.assertEqual(data["available_seats"], 7)
+        self.assertEqual(taken, bytes([0b01110000, 0]))
+
+
+class PerformanceAvailabilityTestCase(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.hall = TheatreHall.objects.create(
+            name="Small Hall", rows=2, seats_in_row=5
+        )
+        self.play = Play.objects.create(title="Hamlet", description="Tragedy")
+        self.play.actors.add(Actor.objects.create(first_name="John", last_name="Doe"))
+        self.play.genres.add(Genre.objects.create(name="Drama"))
+        self.reservation = Reservation.objects.create(user=self.user)
+        self.performances = [
+            Performance.objects.create(
+                play=self.play,
+                theatre_hall=self.hall,
+                showtime=timezone.now() + timedelta(days=1),
+            )
+            for _ in range(5)
+        ]
+        for seat in range(1, 4):
+            Ticket.objects.create(
+                row=1,
+                seat=seat,
+                performance=self.performances[0],
+                reservation=self.reservation,
+            )
+        self.client.force_authenticate(user=self.user)
+
+    def test_performance_list_availability_in_constant_queries(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("theatre_service:performance-list"))
+        self.assertEqual(response.status_code, 200)
+        first = next(
+            item
+            for item in response.data["results"]
+            if item["id"] == self.performances[0].id
+        )
+        self.assertEqual(first["tickets_sold"], 3)
+        self.assertEqual(first["capacity"], 10)
+        self.assertEqual(first["available_seats"], 7)
+
+    def test_performance_detail_availability(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse(
+                    "theatre_service:performance-detail",
+                    args=[self.performances[0].id],
+                )
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["available_seats"], 7)
+
+    def test_tickets_sold_counter_follows_tickets(self):
+        first, second = self.performances[:2]
+        first.refresh_from_db()
+        self.assertEqual(first.tickets_sold, 3)
+
+        ticket = Ticket.objects.filter(performance=first).first()
+        ticket.performance = second
+        ticket.save()
+        ticket.delete()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.tickets_sold, second.tickets_sold), (2, 0))
+
+        self.reservation.delete()
+        first.refresh_from_db()
+        self.assertEqual(first.tickets_sold, 0)
+
+    def test_seats_left_follows_tickets_and_hall(self):
+        def seats_left():
+            return list(
+                Performance.objects.order_by("id").values_list("seats_left", flat=True)
+            )
+
+        self.assertEqual(seats_left(), [7, 10, 10, 10, 10])
+        book_seats(self.user, self.performances[1], [(2, 1), (2, 2)])
+        Ticket.objects.filter(performance=self.performances[0]).first().delete()
+        self.assertEqual(seats_left(), [8, 8, 10, 10, 10])
+
+        self.hall.rows = 3
+        self.hall.save()
+        self.assertEqual(seats_left(), [13, 13, 15, 15, 15])
+
+        other = TheatreHall.objects.create(name="Other", rows=1, seats_in_row=4)
+        performance = self.performances[4]
+        performance.theatre_hall = other
+        performance.save()
+        self.assertEqual(seats_left()[4], 4)
+
+        self.hall.delete()
+        self.assertEqual(seats_left(), [None, None, None, None, 4])
+
+    def test_availability_filters(self):
+        for row in (1, 2):
+            for seat in range(1, 6):
+                Ticket.objects.get_or_create(
+                    row=row,
+                    seat=seat,
+                    performance=self.performances[1],
+                    reservation=self.reservation,
+                )
+        url = reverse("theatre_service:performance-list")
+
+        response = self.client.get(url, {"available": "false"})
+        self.assertEqual(
+            [item["id"] for item in response.data["results"]],
+            [self.performances[1].id],
+        )
+        response = self.client.get(url, {"available": "true"})
+        self.assertEqual(len(response.data["results"]), 4)
+        self.assertNotIn(
+            self.performances[1].id,
+            [item["id"] for item in response.data["results"]],
+        )
+        response = self.client.get(url, {"min_seats": 8})
+        self.assertEqual(
+            sorted(item["id"] for item in response.data["results"]),
+            [performance.id for performance in self.performances[2:]],
+        )
+        response = self.client.get(url, {"min_seats": 0})
+        self.assertEqual(response.status_code, 400)
+
+    def test_performance_edit_keeps_concurrent_sales(self):
+        admin = get_user_model().objects.create_superuser(
+            username="admin", password="testpassword"
+        )
+        self.client.force_authenticate(user=admin)
+        performance = self.performances[0]
+        url = reverse("theatre_service:performance-detail", args=[performance.id])
+        get_object = PerformanceViewSet.get_object
+        seats = iter(range(1, 6))
+
+        def sell_after_load(view):
+            instance = get_object(view)
+            Ticket.objects.create(
+                row=2,
+                seat=next(seats),
+                performance=performance,
+                reservation=self.reservation,
+            )
+            return instance
+
+        with mock.patch.object(PerformanceViewSet, "get_object", sell_after_load):
+            response = self.client.patch(
+                url, {"showtime": (timezone.now() + timedelta(days=2)).isoformat()}
+            )
+        self.assertEqual(response.status_code, 200)
+        performance.refresh_from_db()
+        self.assertEqual((performance.tickets_sold, performance.seats_left), (4, 6))
+
+        other = TheatreHall.objects.create(name="Other", rows=1, seats_in_row=8)
+        with mock.patch.object(PerformanceViewSet, "get_object", sell_after_load):
+            response = self.client.patch(url, {"theatre_hall": other.id})
+        self.assertEqual(response.status_code, 200)
+        performance.refresh_from_db()
+        self.assertEqual((performance.tickets_sold, performance.seats_left), (5, 3))
+
+    def test_recount_tickets_sold_command(self):
+        Performance.objects.update(tickets_sold=9, seats_left=1)
+        out = StringIO()
+        call_command("recount_tickets_sold", batch_size=2, stdout=out)
+        self.assertIn("Recounted sold tickets of 5 performances", out.getvalue())
+        self.assertEqual(
+            list(
+                Performance.objects.order_by("id").values_list(
+                    "tickets_sold", flat=True
+                )
+            ),
+            [3, 0, 0, 0, 0],
+        )
+        self.assertEqual(
+            list(
+                Performance.objects.order_by("id").values_list("seats_left", flat=True)
+            ),
+            [7, 10, 10, 10, 10],
+        )
+
+
+class BookingTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.hall = TheatreHall.objects.create(
+            name="Small Hall", rows=2, seats_in_row=5
+        )
+        self.play = Play.objects.create(title="Hamlet", description="Tragedy")
+        self.performance = Performance.objects.create(
+            play=self.play, theatre_hall=self.hall, showtime=timezone.now()
+        )
+        Ticket.objects.create(
+            row=1,
+            seat=1,
+            performance=self.performance,
+            reservation=Reservation.objects.create(user=self.user),
+        )
+        self.url = reverse("theatre_service:reservation-book")
+        self.client.force_authenticate(user=self.user)
+
+    def book(self, *seats):
+        return self.client.post(
+            self.url,
+            {
+                "performance": self.performance.id,
+                "tickets": [{"row": row, "seat": seat} for row, seat in seats],
+            },
+            format="json",
+        )
+
+    def test_book_several_seats(self):
+        response = self.book((1, 2), (1, 3), (2, 3))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data["tickets"]), 3)
+        reservation = Reservation.objects.get(id=response.data["id"])
+        self.assertEqual(reservation.user, self.user)
+        self.assertEqual(reservation.tickets.count(), 3)
+        self.performance.refresh_from_db()
+        self.assertEqual(self.performance.tickets_sold, 4)
+
+    def test_book_conflict_books_nothing(self):
+        response = self.book((1, 2), (1, 1))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["conflicts"], [{"row": 1, "seat": 1}])
+        self.assertEqual(Ticket.objects.count(), 1)
+        self.performance.refresh_from_db()
+        self.assertEqual(self.performance.tickets_sold, 1)
+
+    def test_book_seat_outside_hall(self):
+        response = self.book((1, 2), (3, 6))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["tickets"][0], {})
+        self.assertIn("row", response.data["tickets"][1])
+        self.assertIn("seat", response.data["tickets"][1])
+        self.assertEqual(Ticket.objects.count(), 1)
+
+    def test_book_too_many_seats(self):
+        self.hall.rows = 40
+        self.hall.seats_in_row = 30
+        self.hall.save()
+        seats = [(row, seat) for row in range(2, 41) for seat in range(1, 31)]
+        response = self.book(*seats)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("tickets", response.data)
+        self.assertEqual(Ticket.objects.count(), 1)
+
+
+class SeatAllocationTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.hall = TheatreHall.objects.create(
+            name="Small Hall", rows=5, seats_in_row=10
+        )
+        self.performance = Performance.objects.create(
+            play=Play.objects.create(title="Hamlet", description="Tragedy"),
+            theatre_hall=self.hall,
+            showtime=timezone.now(),
+        )
+        self.url = reverse("theatre_service:reservation-allocate")
+        self.client.force_authenticate(user=self.user)
+
+    def allocate(self, count):
+        return self.client.post(
+            self.url,
+            {"performance": self.performance.id, "count": count},
+            format="json",
+        )
+
+    def test_allocator_picks_centre_of_ideal_row(self):
+        seat_map = SeatMap(5, 10)
+        self.assertEqual(
+            SeatAllocator(seat_map).allocate(4), [(2, 4), (2, 5), (2, 6), (2, 7)]
+        )
+        seat_map.mark(2, 5)
+        self.assertEqual(
+            SeatAllocator(seat_map, blocked=[(2, 6)]).allocate(2), [(3, 5), (3, 6)]
+        )
+
+    def test_allocator_splits_over_adjacent_rows(self):
+        seat_map = SeatMap(2, 4)
+        for seat in (1, 4):
+            seat_map.mark(1, seat)
+            seat_map.mark(2, seat)
+        seats = SeatAllocator(seat_map).allocate(3)
+        self.assertEqual(len(seats), 3)
+        self.assertEqual({row for row, seat in seats}, {1, 2})
+        self.assertTrue(all(seat in (2, 3) for row, seat in seats))
+        self.assertIsNone(SeatAllocator(seat_map).allocate(5))
+
+    def test_allocate_books_best_seats(self):
+        response = self.allocate(3)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [(ticket["row"], ticket["seat"]) for ticket in response.data["tickets"]],
+            [(2, 5), (2, 6), (2, 7)],
+        )
+        self.performance.refresh_from_db()
+        self.assertEqual(self.performance.tickets_sold, 3)
+
+    def test_allocate_retries_when_cached_map_is_stale(self):
+        get_seat_map(self.performance)
+        with mute_ticket_signals():
+            Ticket.objects.create(
+                row=2,
+                seat=5,
+                performance=self.performance,
+                reservation=Reservation.objects.create(user=self.user),
+            )
+        response = self.allocate(2)
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn(
+            (2, 5),
+            [(ticket["row"], ticket["seat"]) for ticket in response.data["tickets"]],
+        )
+
+    def test_allocate_validates_count(self):
+        limit = settings.SEAT_ALLOCATION["MAX_SEATS"]
+        self.assertEqual(self.allocate(0).status_code, 400)
+        self.assertEqual(self.allocate(limit + 1).status_code, 400)
+
+    def test_allocate_without_room(self):
+        self.hall.rows = 1
+        self.hall.seats_in_row = 2
+        self.hall.save()
+        response = self.allocate(3)
+        self.assertEqual(response.status_code, 409)
+        self.assertIn("detail", response.data)
+        self.assertEqual(Ticket.objects.count(), 0)
+
+
+class ReservationHistoryTestCase(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        other = get_user_model().objects.create_user(
+            username="other", password="testpassword"
+        )
+        hall = TheatreHall.objects.create(name="Small Hall", rows=5, seats_in_row=5)
+        play = Play.objects.create(title="Hamlet", description="Tragedy")
+        performances = [
+            Performance.objects.create(
+                play=play,
+                theatre_hall=hall,
+                showtime=timezone.now() + timedelta(days=day),
+            )
+            for day in (1, 2)
+        ]
+        self.reservations = []
+        for row in range(1, 4):
+            reservation = Reservation.objects.create(user=self.user)
+            for performance in performances:
+                for seat in (1, 2):
+                    Ticket.objects.create(
+                        row=row,
+                        seat=seat,
+                        performance=performance,
+                        reservation=reservation,
+                    )
+            self.reservations.append(reservation)
+        Ticket.objects.create(
+            row=5,
+            seat=5,
+            performance=performances[0],
+            reservation=Reservation.objects.create(user=other),
+        )
+        self.url = reverse("theatre_service:reservation-mine")
+        self.client.force_authenticate(user=self.user)
+
+    def test_own_reservations_with_tickets_in_constant_queries(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        results = response.data["results"]
+        self.assertEqual(
+            [item["id"] for item in results],
+            [reservation.id for reservation in reversed(self.reservations)],
+        )
+        self.assertEqual(len(results[0]["tickets"]), 4)
+        performance = results[0]["tickets"][0]["performance"]
+        self.assertEqual(performance["play"], "Hamlet")
+        self.assertEqual(performance["theatre_hall"], "Small Hall")
+        self.assertIn("showtime", performance)
+
+    def test_paginated_by_created_at(self):
+        response = self.client.get(self.url, {"page_size": 2})
+        self.assertEqual(len(response.data["results"]), 2)
+        response = self.client.get(response.data["next"])
+        self.assertEqual(
+            [item["id"] for item in response.data["results"]],
+            [self.reservations[0].id],
+        )
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_user_filter_uses_index(self):
+        plan = (
+            Reservation.objects.filter(user=self.user)
+            .order_by("-created_at", "-id")
+            .explain()
+        )
+        self.assertIn("reservation_user_created_idx", plan)
+
+
+class ReservationLifecycleTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.hall = TheatreHall.objects.create(
+            name="Small Hall", rows=5, seats_in_row=5
+        )
+        self.play = Play.objects.create(title="Hamlet", description="Tragedy")
+        self.performance = Performance.objects.create(
+            play=self.play, theatre_hall=self.hall, showtime=timezone.now()
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def add_ticket(self, row, seat):
+        response = self.client.post(
+            reverse("theatre_service:ticket-list"),
+            {"row": row, "seat": seat, "performance": self.performance.id},
+        )
+        self.assertEqual(response.status_code, 201)
+        return Ticket.objects.get(id=response.data["id"])
+
+    def transition(self, reservation, name):
+        return self.client.post(
+            reverse(f"theatre_service:reservation-{name}", args=[reservation.id])
+        )
+
+    def test_tickets_go_into_one_cart(self):
+        first = self.add_ticket(1, 1)
+        second = self.add_ticket(1, 2)
+        self.assertEqual(first.reservation_id, second.reservation_id)
+        cart = first.reservation
+        self.assertEqual(cart.status, Reservation.Status.CART)
+        self.assertGreater(cart.expires_at, timezone.now())
+        with self.assertRaises(IntegrityError):
+            Reservation.objects.create(user=self.user, status=Reservation.Status.CART)
+
+    def test_ticket_seat_errors(self):
+        self.add_ticket(1, 1)
+        url = reverse("theatre_service:ticket-list")
+        response = self.client.post(
+            url, {"row": 1, "seat": 1, "performance": self.performance.id}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["seat"], ["Seat is already taken"])
+        response = self.client.post(
+            url, {"row": 6, "seat": 1, "performance": self.performance.id}
+        )
+        self.assertEqual(response.data["row"], ["Row must be between 1 and 5"])
+
+    def test_seat_sold_after_validation(self):
+        self.add_ticket(1, 1)
+        with mock.patch.object(Ticket, "validate_seats", return_value=[{}]):
+            response = self.client.post(
+                reverse("theatre_service:ticket-list"),
+                {"row": 1, "seat": 1, "performance": self.performance.id},
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["seat"], ["Seat is already taken"])
+        self.assertEqual(Ticket.objects.count(), 1)
+        self.performance.refresh_from_db()
+        self.assertEqual(self.performance.tickets_sold, 1)
+
+    def test_confirm_and_cancel(self):
+        cart = self.add_ticket(1, 1).reservation
+        response = self.transition(cart, "confirm")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["status"], "confirmed")
+        self.assertEqual(self.transition(cart, "confirm").status_code, 409)
+        self.assertNotEqual(self.add_ticket(1, 2).reservation_id, cart.id)
+
+        response = self.transition(cart, "cancel")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(cart.tickets.exists())
+        self.performance.refresh_from_db()
+        self.assertEqual(self.performance.tickets_sold, 1)
+        self.assertEqual(self.transition(cart, "cancel").status_code, 409)
+
+    def test_confirm_rejects_empty_or_expired_cart(self):
+        empty = Reservation.objects.create(
+            user=self.user,
+            status=Reservation.Status.CART,
+            expires_at=timezone.now() + timedelta(minutes=5),
+        )
+        self.assertEqual(self.transition(empty, "confirm").status_code, 409)
+        Reservation.objects.filter(id=empty.id).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        Ticket.objects.create(
+            row=1, seat=1, performance=self.performance, reservation=empty
+        )
+        self.assertEqual(self.transition(empty, "confirm").status_code, 409)
+
+    def test_other_users_reservations_are_hidden(self):
+        other = get_user_model().objects.create_user(
+            username="other", password="testpassword"
+        )
+        reservation = Reservation.objects.create(user=other)
+        self.assertEqual(self.transition(reservation, "cancel").status_code, 404)
+
+    def test_expire_reservations_command(self):
+        users = [
+            get_user_model().objects.create_user(
+                username=f"user{index}", password="testpassword"
+            )
+            for index in range(3)
+        ]
+        for row, user in enumerate(users, start=1):
+            cart = Reservation.objects.create(
+                user=user,
+                status=Reservation.Status.CART,
+                expires_at=timezone.now() - timedelta(minutes=1),
+            )
+            for seat in range(1, 4):
+                Ticket.objects.create(
+                    row=row, seat=seat, performance=self.performance, reservation=cart
+                )
+        live = self.add_ticket(5, 5).reservation
+        get_seat_map(self.performance)
+
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(
+            connection
+        ) as queries:
+            call_command("expire_reservations", batch_size=2, stdout=out)
+        self.assertIn("Expired 3 abandoned carts", out.getvalue())
+        ticket_deletes = [
+            query
+            for query in queries.captured_queries
+            if query["sql"].startswith('DELETE FROM "theatre_booking_ticket"')
+        ]
+        self.assertEqual(len(ticket_deletes), 2)
+
+        self.assertEqual(
+            Reservation.objects.filter(status=Reservation.Status.EXPIRED).count(), 3
+        )
+        live.refresh_from_db()
+        self.assertEqual(live.status, Reservation.Status.CART)
+        self.assertEqual(Ticket.objects.count(), 1)
+        self.performance.refresh_from_db()
+        self.assertEqual(self.performance.tickets_sold, 1)
+        seat_map = get_seat_map(self.performance)
+        self.assertEqual(seat_map.taken_count, 1)
+        self.assertTrue(seat_map.is_taken(5, 5))
+
+
+class SeatHoldTestCase(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.other_user = get_user_model().objects.create_user(
+            username="otheruser", password="testpassword"
+        )
+        self.hall = TheatreHall.objects.create(
+            name="Small Hall", rows=2, seats_in_row=5
+        )
+        self.performance = Performance.objects.create(
+            theatre_hall=self.hall, showtime=timezone.now()
+        )
+        self.url = reverse(
+            "theatre_service:performance-holds", args=[self.performance.id]
+        )
+        self.seats = {"tickets": [{"row": 1, "seat": 1}, {"row": 1, "seat": 2}]}
+
+    def hold(self, user, method="post", data=None):
+        self.client.force_authenticate(user=user)
+        return getattr(self.client, method)(self.url, data or self.seats, format="json")
+
+    def test_hold_conflict_fails_fast(self):
+        self.assertEqual(self.hold(self.user).status_code, 200)
+        response = self.hold(self.other_user)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(len(response.data["conflicts"]), 2)
+
+    def test_hold_extend_and_release(self):
+        self.hold(self.user)
+        self.assertEqual(self.hold(self.user).status_code, 200)
+        response = self.hold(self.user, method="patch")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["tickets"]), 2)
+        self.assertEqual(self.hold(self.user, method="delete").status_code, 204)
+        self.assertFalse(SeatHold.objects.exists())
+
+    def test_booking_respects_and_consumes_holds(self):
+        self.hold(self.user)
+        booking = {"performance": self.performance.id, **self.seats}
+        url = reverse("theatre_service:reservation-book")
+
+        self.client.force_authenticate(user=self.other_user)
+        response = self.client.post(url, booking, format="json")
+        self.assertEqual(response.status_code, 409)
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(url, booking, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(SeatHold.objects.exists())
+
+    def test_expired_holds_are_swept(self):
+        self.hold(self.user)
+        SeatHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.hold(self.other_user).status_code, 200)
+        SeatHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(sweep_expired_holds(batch_size=1), 2)
+        self.assertFalse(SeatHold.objects.exists())
+
+
+class CatalogCacheTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.play = Play.objects.create(title="Hamlet", description="Tragedy")
+        self.client.force_authenticate(user=self.user)
+
+    def test_list_is_served_from_cache(self):
+        url = reverse("theatre_service:genre-list")
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(first.content, second.content)
+
+    def test_cache_invalidated_by_related_changes(self):
+        url = reverse("theatre_service:play-list")
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.play.genres.add(Genre.objects.create(name="Drama"))
+        response = self.client.get(url)
+        self.assertContains(response, "Drama")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Genre.objects.filter(name="Drama").update(name="Comedy")
+            Genre.objects.get(name="Comedy").save()
+        response = self.client.get(url)
+        self.assertContains(response, "Comedy")
+
+    def test_warm_catalog_cache_command(self):
+        call_command("warm_catalog_cache", "--detail", stdout=StringIO())
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                reverse("theatre_service:play-detail", args=[self.play.id])
+            )
+        self.assertContains(response, "Hamlet")
+
+
+@override_settings(READ_REPLICAS=["default"])
+class ReplicaRoutingTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.performance = Performance.objects.create(
+            play=Play.objects.create(title="Hamlet", description="Tragedy"),
+            theatre_hall=TheatreHall.objects.create(
+                name="Small Hall", rows=2, seats_in_row=5
+            ),
+            showtime=timezone.now() + timedelta(days=1),
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def replica_reads(self, method, url, data=None):
+        with mock.patch(
+            "theatre_service.db_routers.random.choice", wraps=random.choice
+        ) as choice:
+            response = getattr(self.client, method)(url, data, format="json")
+        return response, choice.called
+
+    @override_settings(READ_REPLICAS=["replica"])
+    def test_router(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Play), "default")
+        with use_replica():
+            self.assertEqual(router.db_for_read(Play), "replica")
+            self.assertEqual(router.db_for_write(Play), "default")
+        self.assertIs(router.allow_migrate("replica", "theatre_booking"), False)
+        self.assertIsNone(router.allow_migrate("default", "theatre_booking"))
+
+    def test_safe_requests_read_from_replica(self):
+        url = reverse("theatre_service:performance-list")
+        response, from_replica = self.replica_reads("get", url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(from_replica)
+
+        _, from_replica = self.replica_reads(
+            "get", reverse("theatre_service:reservation-mine")
+        )
+        self.assertFalse(from_replica)
+
+    def test_user_reads_primary_after_booking(self):
+        response, from_replica = self.replica_reads(
+            "post",
+            reverse("theatre_service:ticket-list"),
+            {"row": 1, "seat": 1, "performance": self.performance.id},
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(from_replica)
+
+        url = reverse("theatre_service:performance-detail", args=[self.performance.id])
+        response, from_replica = self.replica_reads("get", url)
+        self.assertEqual(response.data["tickets_sold"], 1)
+        self.assertFalse(from_replica)
+
+        self.client.force_authenticate(
+            user=get_user_model().objects.create_user(
+                username="otheruser", password="testpassword"
+            )
+        )
+        _, from_replica = self.replica_reads("get", url)
+        self.assertTrue(from_replica)
+
+    def test_catalog_reads_primary_after_change(self):
+        url = reverse("theatre_service:genre-list")
+        with self.captureOnCommitCallbacks(execute=True):
+            Genre.objects.create(name="Drama")
+        response, from_replica = self.replica_reads("get", url)
+        self.assertContains(response, "Drama")
+        self.assertFalse(from_replica)
+
+        _, from_replica = self.replica_reads(
+            "get", reverse("theatre_service:performance-list")
+        )
+        self.assertTrue(from_replica)
+
+    @override_settings(READ_REPLICAS=[])
+    def test_sync_replicas_without_replicas(self):
+        with self.assertRaises(CommandError):
+            call_command("sync_replicas", stdout=StringIO())
+
+
+@override_settings(DATABASE_LOCK_RETRY={"ATTEMPTS": 3, "DELAY": 0, "MAX_DELAY": 0})
+class ContendedWriteTestCase(SimpleTestCase):
+    def write(self, *errors):
+        errors = list(errors)
+        modes = []
+
+        @contended_write
+        def write():
+            modes.append(transaction_mode.get())
+            if errors:
+                raise errors.pop(0)
+            return "written"
+
+        return write, modes
+
+    def test_retries_while_locked(self):
+        write, modes = self.write(
+            OperationalError("database is locked"),
+            OperationalError("database is locked"),
+        )
+        self.assertEqual(write(), "written")
+        self.assertEqual(modes, ["IMMEDIATE"] * 3)
+
+    def test_gives_up_after_attempts(self):
+        write, modes = self.write(*[OperationalError("database is locked")] * 3)
+        with self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(modes), 3)
+
+    def test_other_errors_are_not_retried(self):
+        write, modes = self.write(OperationalError("no such table: ticket"))
+        with self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(modes), 1)
+
+
+class SQLiteBackendTestCase(TestCase):
+    def test_pragmas_applied(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+
+class PaginationTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.staff = get_user_model().objects.create_user(
+            username="staff", password="testpassword", is_staff=True
+        )
+        self.hall = TheatreHall.objects.create(
+            name="Small Hall", rows=2, seats_in_row=5
+        )
+        start = timezone.now()
+        self.performances = [
+            Performance.objects.create(
+                theatre_hall=self.hall, showtime=start + timedelta(days=days)
+            )
+            for days in (3, 1, 2)
+        ]
+
+    def test_performances_cursor_paginated_by_showtime(self):
+        self.client.force_authenticate(user=self.user)
+        url = reverse("theatre_service:performance-list")
+        response = self.client.get(url, {"page_size": 2})
+        self.assertEqual(response.status_code, 200)
+        first_page = [item["id"] for item in response.data["results"]]
+        self.assertIsNotNone(response.data["next"])
+
+        response = self.client.get(response.data["next"])
+        second_page = [item["id"] for item in response.data["results"]]
+        self.assertIsNone(response.data["next"])
+
+        by_showtime = sorted(self.performances, key=lambda item: item.showtime)
+        self.assertEqual(first_page + second_page, [item.id for item in by_showtime])
+
+    def test_catalog_lists_not_paginated(self):
+        self.client.force_authenticate(user=self.user)
+        for name in ("actor-list", "genre-list", "theatrehall-list"):
+            response = self.client.get(reverse(f"theatre_service:{name}"))
+            self.assertIsInstance(response.json(), list)
+        response = self.client.get(reverse("theatre_service:theatrehall-list"))
+        self.assertEqual([hall["id"] for hall in response.json()], [self.hall.id])
+
+    def test_stream_full_list_for_staff(self):
+        url = reverse("theatre_service:performance-stream")
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        items = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(len(items), 3)
+        self.assertEqual(items[0]["available_seats"], 10)
+
+
+class PerformanceFilterTestCase(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.drama = Genre.objects.create(name="Drama")
+        self.hamlet = Play.objects.create(title="Hamlet", description="Tragedy")
+        self.hamlet.genres.add(self.drama)
+        self.comedy = Play.objects.create(title="Comedy", description="Fun")
+        self.main_hall = TheatreHall.objects.create(
+            name="Main Hall", rows=10, seats_in_row=10
+        )
+        self.small_hall = TheatreHall.objects.create(
+            name="Small Hall", rows=2, seats_in_row=5
+        )
+        self.now = timezone.now()
+        self.past = Performance.objects.create(
+            play=self.hamlet,
+            theatre_hall=self.main_hall,
+            showtime=self.now - timedelta(days=1),
+        )
+        self.soon = Performance.objects.create(
+            play=self.hamlet,
+            theatre_hall=self.small_hall,
+            showtime=self.now + timedelta(days=1),
+        )
+        self.later = Performance.objects.create(
+            play=self.comedy,
+            theatre_hall=self.main_hall,
+            showtime=self.now + timedelta(days=10),
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def list_ids(self, **params):
+        response = self.client.get(reverse("theatre_service:performance-list"), params)
+        self.assertEqual(response.status_code, 200)
+        return [item["id"] for item in response.data["results"]]
+
+    def test_defaults_to_upcoming(self):
+        self.assertEqual(self.list_ids(), [self.soon.id, self.later.id])
+
+    def test_filters(self):
+        self.assertEqual(
+            self.list_ids(showtime__gte=(self.now - timedelta(days=2)).isoformat()),
+            [self.past.id, self.soon.id, self.later.id],
+        )
+        self.assertEqual(
+            self.list_ids(showtime__lte=(self.now + timedelta(days=2)).isoformat()),
+            [self.past.id, self.soon.id],
+        )
+        self.assertEqual(self.list_ids(play=self.comedy.id), [self.later.id])
+        self.assertEqual(self.list_ids(theatre_hall=self.main_hall.id), [self.later.id])
+        self.assertEqual(self.list_ids(play__genres=self.drama.id), [self.soon.id])
+
+    def test_invalid_filter(self):
+        response = self.client.get(
+            reverse("theatre_service:performance-list"), {"showtime__gte": "soon"}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_play_filter_uses_index(self):
+        plan = Performance.objects.filter(
+            play=self.hamlet, showtime__gte=self.now
+        ).explain()
+        self.assertIn("performance_play_time_idx", plan)
+
+
+class PerformanceCalendarTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.drama = Genre.objects.create(name="Drama")
+        self.hamlet = Play.objects.create(title="Hamlet", description="Tragedy")
+        self.hamlet.genres.add(self.drama)
+        self.main_hall = TheatreHall.objects.create(
+            name="Main Hall", rows=10, seats_in_row=10
+        )
+        self.small_hall = TheatreHall.objects.create(
+            name="Small Hall", rows=2, seats_in_row=5
+        )
+        self.tz = timezone.get_default_timezone()
+        self.day = timezone.localdate(timezone=self.tz) + timedelta(days=1)
+        self.first = self.create_performance(self.day, 19, self.main_hall)
+        self.create_performance(self.day, 21, self.small_hall)
+        # Still the previous day in UTC
+        self.create_performance(self.day + timedelta(days=1), 0, self.small_hall)
+        self.url = reverse("theatre_service:performance-calendar")
+        self.client.force_authenticate(user=self.user)
+
+    def create_performance(self, day, hour, hall):
+        return Performance.objects.create(
+            play=self.hamlet,
+            theatre_hall=hall,
+            showtime=datetime(day.year, day.month, day.day, hour, 30, tzinfo=self.tz),
+        )
+
+    def calendar(self, **params):
+        params = {"start": self.day.isoformat(), "days": 3, **params}
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data["results"]
+
+    def test_counts_per_local_day(self):
+        results = self.calendar()
+        self.assertEqual(
+            [(day["performances"], day["seats_left"]) for day in results],
+            [(2, 110), (1, 10), (0, 0)],
+        )
+        self.assertEqual(results[0]["date"], self.day.isoformat())
+
+    def test_group_by_hall_and_genre(self):
+        halls = self.calendar(group_by="hall")[0]["groups"]
+        self.assertEqual(
+            [(group["name"], group["seats_left"]) for group in halls],
+            [("Main Hall", 100), ("Small Hall", 10)],
+        )
+        genres = self.calendar(group_by="genre")[0]["groups"]
+        self.assertEqual(
+            genres,
+            [
+                {
+                    "id": self.drama.id,
+                    "name": "Drama",
+                    "performances": 2,
+                    "seats_left": 110,
+                }
+            ],
+        )
+
+    def test_cached_until_day_changes(self):
+        self.calendar()
+        with self.assertNumQueries(0):
+            self.calendar()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Ticket.objects.create(
+                row=1,
+                seat=1,
+                performance=self.first,
+                reservation=Reservation.objects.create(user=self.user),
+            )
+        with CaptureQueriesContext(connection) as queries:
+            results = self.calendar()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(results[0]["seats_left"], 109)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_performance(self.day + timedelta(days=2), 12, self.main_hall)
+        self.assertEqual(self.calendar()[2]["performances"], 1)
+
+    def test_days_limit(self):
+        response = self.client.get(
+            self.url, {"days": settings.PERFORMANCE_CALENDAR["MAX_DAYS"] + 1}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_start_within_horizon(self):
+        for start in ("9999-12-31", "0001-01-01"):
+            response = self.client.get(self.url, {"start": start})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("start", response.data)
+
+        horizon = settings.PERFORMANCE_CALENDAR["HORIZON_DAYS"]
+        last_start = timezone.localdate(timezone=self.tz) + timedelta(days=horizon)
+        response = self.client.get(
+            self.url, {"start": last_start.isoformat(), "days": 1}
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            self.url, {"start": last_start.isoformat(), "days": 2}
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class PlaySearchTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.actor = Actor.objects.create(
+                first_name="Laurence", last_name="Olivier"
+            )
+            self.hamlet = Play.objects.create(
+                title="Hamlet", description="The prince of Denmark"
+            )
+            self.hamlet.actors.add(self.actor)
+            self.hamlet.genres.add(Genre.objects.create(name="Tragedy"))
+            self.other = Play.objects.create(
+                title="Rosencrantz", description="Two courtiers from Hamlet"
+            )
+        self.client.force_authenticate(user=self.user)
+
+    def search(self, query):
+        response = self.client.get(
+            reverse("theatre_service:play-list"), {"search": query}
+        )
+        self.assertEqual(response.status_code, 200)
+        return [item["id"] for item in response.data]
+
+    def test_search_ranks_title_first(self):
+        self.assertEqual(self.search("hamlet"), [self.hamlet.id, self.other.id])
+
+    def test_search_actor_and_genre(self):
+        self.assertEqual(self.search("olivier"), [self.hamlet.id])
+        self.assertEqual(self.search("tragedy prince"), [self.hamlet.id])
+        self.assertEqual(self.search("comedy"), [])
+
+    def test_index_follows_actor_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.actor.last_name = "Branagh"
+            self.actor.save()
+        self.assertEqual(self.search("branagh"), [self.hamlet.id])
+        self.assertEqual(self.search("olivier"), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.actor.delete()
+        self.assertEqual(self.search("branagh"), [])
+
+    def test_fallback_search(self):
+        self.assertEqual(
+            fallback_search(["hamlet"], 10), [self.hamlet.id, self.other.id]
+        )
+        self.assertEqual(fallback_search(["olivier", "prince"], 10), [self.hamlet.id])
+
+
+class BenchmarkTestCase(TestCase):
+    def test_seed_dataset(self):
+        users = seed_dataset(
+            users=2,
+            halls=2,
+            genres=2,
+            actors=3,
+            plays=2,
+            performances=3,
+            tickets=25,
+            batch_size=7,
+        )
+        self.assertTrue(users[0].is_staff)
+        self.assertEqual(Performance.objects.count(), 3)
+        self.assertEqual(Ticket.objects.count(), 25)
+        self.assertEqual(Reservation.objects.count(), 7)
+        self.assertEqual(
+            Ticket.objects.order_by("id").first().reservation.user, users[0]
+        )
+
+    def test_bench_regressions(self):
+        baseline = {"play-list": {"p50_ms": 10.0, "queries_median": 3}}
+        self.assertEqual(
+            BenchCommand.regressions(
+                baseline, {"play-list": {"p50_ms": 11.0, "queries_median": 3}}, 0.2
+            ),
+            [],
+        )
+        self.assertEqual(
+            len(
+                BenchCommand.regressions(
+                    baseline, {"play-list": {"p50_ms": 13.0, "queries_median": 4}}, 0.2
+                )
+            ),
+            2,
+        )
+
+
+class ServerTimingTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse("theatre_service:performance-list"))
+        timing = response["Server-Timing"]
+        self.assertIn("db;dur=", timing)
+        self.assertIn('desc="1 queries"', timing)
+        for name in ("view;", "app;", "render;", "total;"):
+            self.assertIn(name, timing)
+
+    def test_budget_warning(self):
+        budgets = {"theatre_booking:performance-list": {"queries": 0}}
+        with self.settings(
+            REQUEST_INSTRUMENTATION={"ENABLED": True, "BUDGETS": budgets}
+        ), self.assertLogs("theatre_service.performance", "WARNING") as logs:
+            self.client.get(reverse("theatre_service:performance-list"))
+        record = logs.records[0]
+        self.assertEqual(record.route, "theatre_booking:performance-list")
+        self.assertEqual(record.exceeded, ["queries"])
+        self.assertIn("theatre_booking_performance", record.slowest_sql)
+
+    def test_sql_capture_for_staff_api_users(self):
+        staff = get_user_model().objects.create_user(
+            username="staff", password="testpassword", is_staff=True
+        )
+        self.client.force_authenticate(user=None)
+
+        def get_as(user):
+            self.client.get(
+                reverse("theatre_service:performance-list"),
+                headers={"authorization": f"Bearer {AccessToken.for_user(user)}"},
+            )
+
+        instrumentation = {**settings.REQUEST_INSTRUMENTATION}
+        instrumentation["SQL_CAPTURE_SAMPLE_RATE"] = 0
+        with self.settings(REQUEST_INSTRUMENTATION=instrumentation):
+            with self.assertNoLogs("theatre_service.performance", "INFO"):
+                get_as(self.user)
+            with self.assertLogs("theatre_service.performance", "INFO") as logs:
+                get_as(staff)
+        record = logs.records[0]
+        self.assertEqual(record.getMessage(), "Request SQL")
+        self.assertTrue(
+            any("theatre_booking_performance" in sql for _, sql in record.statements)
+        )
+
+
+class ScheduleImportTestCase(APITestCase):
+    ndjson = "\n".join(
+        json.dumps(record)
+        for record in [
+            {
+                "type": "play",
+                "title": "Hamlet",
+                "actors": ["Jane Doe"],
+                "genres": ["Drama"],
+            },
+            {"type": "genre", "name": "Drama"},
+            {"type": "actor", "first_name": "Jane", "last_name": "Doe"},
+            {"type": "theatre_hall", "name": "Main", "rows": 10, "seats_in_row": 20},
+            {
+                "type": "performance",
+                "play": "Hamlet",
+                "theatre_hall": "Main",
+                "showtime": "2030-01-01T19:00:00",
+            },
+            {"type": "performance", "play": "Macbeth", "theatre_hall": "Main"},
+            {"type": "theatre_hall", "name": "Small", "rows": "x", "seats_in_row": 5},
+        ]
+    )
+
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            username="admin", password="adminpassword"
+        )
+
+    def test_import_ndjson(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.import_file("schedule.ndjson", self.ndjson)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["created"]["performance"], 1)
+        self.assertEqual(
+            [(error["line"], error["type"]) for error in response.data["errors"]],
+            [(6, "performance"), (7, "theatre_hall")],
+        )
+        play = Play.objects.get(title="Hamlet")
+        self.assertEqual(play.actors.get().full_name, "Jane Doe")
+        self.assertEqual(play.genres.get().name, "Drama")
+
+        response = self.import_file("schedule.ndjson", self.ndjson)
+        self.assertEqual(response.data["existing"]["play"], 1)
+        self.assertEqual(Play.objects.count(), 1)
+        self.assertEqual(Performance.objects.count(), 2)
+
+    def test_import_csv_command(self):
+        path = self.tmp_file(
+            "type,name,first_name,last_name,rows,seats_in_row,title,genres\n"
+            "genre,Drama,,,,,,\n"
+            "genre,Comedy,,,,,,\n"
+            "play,,,,,,Twelfth Night,Drama|Comedy\n"
+        )
+        out = StringIO()
+        call_command("import_schedule", path, "--batch-size", "2", stdout=out)
+        self.assertEqual(json.loads(out.getvalue())["created"]["genre"], 2)
+        self.assertEqual(Play.objects.get(title="Twelfth Night").genres.count(), 2)
+
+    def test_import_requires_staff(self):
+        self.admin.is_staff = False
+        self.admin.save()
+        response = self.import_file("schedule.ndjson", self.ndjson)
+        self.assertEqual(response.status_code, 403)
+
+    def import_file(self, name, content):
+        self.client.force_authenticate(user=self.admin)
+        upload = SimpleUploadedFile(name, content.encode())
+        return self.client.post(
+            reverse("theatre_service:import-schedule"),
+            {"file": upload},
+            format="multipart",
+        )
+
+    def tmp_file(self, content):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "schedule.csv")
+        with open(path, "w") as file:
+            file.write(content)
+        return path
+
+
+class ExportTestCase(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.staff = get_user_model().objects.create_user(
+            username="staff", password="testpassword", is_staff=True
+        )
+        hall = TheatreHall.objects.create(name="Small Hall", rows=2, seats_in_row=5)
+        play = Play.objects.create(title="Hamlet", description="Prince")
+        self.performances = [
+            Performance.objects.create(
+                play=play,
+                theatre_hall=hall,
+                showtime=timezone.now() + timedelta(days=days),
+            )
+            for days in (1, 2)
+        ]
+        reservation = Reservation.objects.create(user=self.user)
+        for performance in self.performances:
+            for seat in (1, 2):
+                Ticket.objects.create(
+                    row=1, seat=seat, performance=performance, reservation=reservation
+                )
+
+    def export(self, name, **params):
+        response = self.client.get(reverse(f"theatre_service:{name}-export"), params)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode()
+
+    def test_export_tickets_csv(self):
+        self.client.force_authenticate(user=self.staff)
+        lines = self.export("ticket", performance=self.performances[0].id)
+        rows = list(csv.DictReader(StringIO(lines)))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]["play"], "Hamlet")
+        self.assertEqual(rows[0]["theatre_hall"], "Small Hall")
+        self.assertEqual(rows[0]["username"], "testuser")
+
+    def test_export_reservations_ndjson(self):
+        self.client.force_authenticate(user=self.staff)
+        lines = self.export("reservation", file_format="ndjson").splitlines()
+        self.assertEqual(len(lines), 1)
+        record = json.loads(lines[0])
+        self.assertEqual(record["tickets"], 4)
+        self.assertEqual(record["username"], "testuser")
+
+    def test_export_is_staff_only(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse("theatre_service:ticket-export"))
+        self.assertEqual(response.status_code, 403)
+
+
+class AsyncPerformanceViewsTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.hall = TheatreHall.objects.create(
+            name="Small Hall", rows=2, seats_in_row=5
+        )
+        start = timezone.now()
+        self.performances = [
+            Performance.objects.create(
+                theatre_hall=self.hall, showtime=start + timedelta(days=days)
+            )
+            for days in (3, 1, 2)
+        ]
+        reservation = Reservation.objects.create(user=self.user)
+        Ticket.objects.create(
+            row=1, seat=2, performance=self.performances[1], reservation=reservation
+        )
+        self.headers = {"authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+
+    async def test_list_is_keyset_paginated(self):
+        url = reverse("theatre_service:async-performance-list")
+        response = await self.async_client.get(
+            url, {"page_size": 2}, headers=self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+        first_page = response.json()
+        self.assertEqual(first_page["results"][0]["available_seats"], 9)
+
+        response = await self.async_client.get(first_page["next"], headers=self.headers)
+        second_page = response.json()
+        self.assertIsNone(second_page["next"])
+
+        by_showtime = sorted(self.performances, key=lambda item: item.showtime)
+        self.assertEqual(
+            [item["id"] for item in first_page["results"] + second_page["results"]],
+            [item.id for item in by_showtime],
+        )
+
+    async def test_detail_and_seats(self):
+        performance = self.performances[1]
+        response = await self.async_client.get(
+            reverse("theatre_service:async-performance-detail", args=[performance.id]),
+            headers=self.headers,
+        )
+        self.assertEqual(response.json()["tickets_sold"], 1)
+        self.assertIn("Server-Timing", response)
+
+        response = await self.async_client.get(
+            reverse("theatre_service:async-performance-seats", args=[performance.id]),
+            headers=self.headers,
+        )
+        self.assertEqual(response.json()["available_seats"], 9)
+
+        response = await self.async_client.get(
+            reverse("theatre_service:async-performance-detail", args=[0]),
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, 404)
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get(
+            reverse("theatre_service:async-performance-list")
+        )
+        self.assertEqual(response.status_code, 401)
+
+
+class SeatEventsTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        hall = TheatreHall.objects.create(name="Small Hall", rows=2, seats_in_row=5)
+        self.performance = Performance.objects.create(
+            theatre_hall=hall, showtime=timezone.now() + timedelta(days=1)
+        )
+        self.reservation = Reservation.objects.create(user=self.user)
+        self.headers = {"authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+
+    def create_ticket(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Ticket.objects.create(
+                row=1,
+                seat=3,
+                performance=self.performance,
+                reservation=self.reservation,
+            )
+
+    async def test_stream_snapshot_and_ticket_events(self):
+        response = await self.async_client.get(
+            reverse(
+                "theatre_service:async-performance-events", args=[self.performance.id]
+            ),
+            headers=self.headers,
+        )
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = aiter(response.streaming_content)
+        try:
+            message = (await anext(events)).decode()
+            self.assertTrue(message.startswith("event: snapshot\n"))
+            self.assertEqual(
+                json.loads(message.split("data: ")[1])["available_seats"], 10
+            )
+
+            await sync_to_async(self.create_ticket)()
+            message = (await anext(events)).decode()
+            self.assertTrue(message.startswith("event: seats-taken\n"))
+            self.assertEqual(json.loads(message.split("data: ")[1])["seats"], [[1, 3]])
+        finally:
+            await events.aclose()
+
+    async def test_stream_keeps_events_during_first_snapshot(self):
+        async def snapshot_then_sell(pk):
+            event = await snapshot_event(pk)
+            await sync_to_async(self.create_ticket)()
+            return event
+
+        with mock.patch(
+            "theatre_booking.async_views.snapshot_event", snapshot_then_sell
+        ):
+            response = await self.async_client.get(
+                reverse(
+                    "theatre_service:async-performance-events",
+                    args=[self.performance.id],
+                ),
+                headers=self.headers,
+            )
+            events = aiter(response.streaming_content)
+            try:
+                message = (await anext(events)).decode()
+                self.assertTrue(message.startswith("event: snapshot\n"))
+                message = (await asyncio.wait_for(anext(events), timeout=1)).decode()
+                self.assertTrue(message.startswith("event: seats-taken\n"))
+            finally:
+                await events.aclose()
+
+    async def test_cache_backend_relays_events(self):
+        broadcaster = Broadcaster(CacheBackend())
+        with self.settings(SEAT_EVENTS={**settings.SEAT_EVENTS, "POLL_INTERVAL": 0.01}):
+            queue = broadcaster.subscribe(self.performance.id)
+            try:
+                await asyncio.sleep(0.05)
+                await sync_to_async(broadcaster.publish)(
+                    self.performance.id, SEATS_RELEASED, [(2, 4)]
+                )
+                event = await asyncio.wait_for(queue.get(), timeout=1)
+            finally:
+                broadcaster.unsubscribe(self.performance.id, queue)
+        self.assertEqual(event["type"], SEATS_RELEASED)
+        self.assertEqual(event["seats"], [[2, 4]])
+
+
+class SlidingWindowThrottleTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.now = 6000.0
+
+    def throttle(self, throttle_class):
+        throttle = throttle_class()
+        throttle.timer = lambda: self.now
+        return throttle
+
+    def allowed(self, throttle_class, count):
+        request = APIRequestFactory().get("/")
+        request.user = self.user
+        return [
+            self.throttle(throttle_class).allow_request(request, None)
+            for _ in range(count)
+        ]
+
+    def test_sliding_window(self):
+        rates = {"user": "3/min"}
+        with mock.patch.object(SlidingWindowUserRateThrottle, "THROTTLE_RATES", rates):
+            self.assertEqual(
+                self.allowed(SlidingWindowUserRateThrottle, 4),
+                [True, True, True, False],
+            )
+            throttle = self.throttle(SlidingWindowUserRateThrottle)
+            request = APIRequestFactory().get("/")
+            request.user = self.user
+            self.assertFalse(throttle.allow_request(request, None))
+            self.assertAlmostEqual(throttle.wait(), 60 + 20)
+
+            # Half-way through the next window the previous one counts 1.5.
+            self.now += 90
+            self.assertEqual(
+                self.allowed(SlidingWindowUserRateThrottle, 2), [True, False]
+            )
+
+    def test_booking_scope(self):
+        rates = {"booking": "1/min"}
+        with mock.patch.object(
+            SlidingWindowScopedRateThrottle, "THROTTLE_RATES", rates
+        ):
+            self.client.force_authenticate(user=self.user)
+            url = reverse("theatre_service:reservation-book")
+            self.assertEqual(self.client.post(url, {}).status_code, 400)
+            response = self.client.post(url, {})
+            self.assertEqual(response.status_code, 429)
+            self.assertIn("Retry-After", response)
+            response = self.client.get(reverse("theatre_service:performance-list"))
+            self.assertEqual(response.status_code, 200)
+
+
+class RendererTestCase(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.hall = TheatreHall.objects.create(
+            name="Small Hall", rows=2, seats_in_row=5
+        )
+        self.performance = Performance.objects.create(
+            theatre_hall=self.hall, showtime=timezone.now() + timedelta(days=1)
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_orjson_matches_default_renderer(self):
+        data = {
+            "showtime": datetime(2030, 1, 1, 19, tzinfo=dt_timezone.utc),
+            "price": Decimal("12.50"),
+            "id": uuid.UUID(int=1),
+            "title": "Čajka",
+            "seats": [[1, 2]],
+        }
+        self.assertEqual(OrjsonRenderer().render(data), JSONRenderer().render(data))
+
+    def test_msgpack_negotiation(self):
+        url = reverse("theatre_service:performance-list")
+        response = self.client.get(url, HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        data = msgpack.unpackb(response.content)
+        self.assertEqual(data["results"][0]["id"], self.performance.id)
+        self.assertEqual(data, self.client.get(url).json())
+
+    def test_msgpack_request_body(self):
+        response = self.client.post(
+            reverse("theatre_service:reservation-book"),
+            msgpack.packb(
+                {
+                    "performance": self.performance.id,
+                    "tickets": [{"row": 1, "seat": 2}],
+                }
+            ),
+            content_type="application/msgpack",
+        )
+        self.assertEqual(response.status_code, 201)
@@ -1,6 +1,7 @@
 from django.urls import include, path
 from rest_framework import routers
 
+from theatre_booking import async_views
 from theatre_booking.views import (
     ActorViewSet,
     GenreViewSet,
@@ -9,6 +10,7 @@ from theatre_booking.views import (
     PlayViewSet,
     PerformanceViewSet,
     TicketViewSet,
+    ScheduleImportView,
 )
 
 router = routers.DefaultRouter()
@@ -21,6 +23,29 @@ router.register("reservations", ReservationViewSet)
 router.register("ticket", TicketViewSet)
 
 
-urlpatterns = [path("/", include(router.urls))]
+urlpatterns = [
+    path("/", include(router.urls)),
+    path("import-schedule/", ScheduleImportView.as_view(), name="import-schedule"),
+    path(
+        "async/performances/",
+        async_views.performance_list,
+        name="async-performance-list",
+    ),
+    path(
+        "async/performances/<int:pk>/",
+        async_views.performance_detail,
+        name="async-performance-detail",
+    ),
+    path(
+        "async/performances/<int:pk>/seats/",
+        async_views.performance_seats,
+        name="async-performance-seats",
+    ),
+    path(
+        "async/performances/<int:pk>/events/",
+        async_views.performance_events,
+        name="async-performance-events",
+    ),
+]
 
 app_name = "theatre_service"
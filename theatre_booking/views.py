@@ -1,6 +1,32 @@
+import io
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import Count, F, Prefetch
+from django.utils import timezone
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiParameter
-from rest_framework import viewsets
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from theatre_booking.allocation import NoAdjacentSeats
+from theatre_booking.booking import (
+    InvalidTransition,
+    SeatsUnavailable,
+    change_status,
+    extend_holds,
+    get_cart,
+    hold_seats,
+    release_holds,
+)
+from theatre_booking.catalog_cache import CatalogCacheMixin
+from theatre_booking.importer import import_schedule
 from theatre_booking.models import (
     Actor,
     Genre,
@@ -21,12 +47,51 @@ from theatre_booking.serializers import (
     PlayListSerializer,
     PerformanceListSerializer,
     PerformanceDetailSerializer,
+    PerformanceFilterSerializer,
+    CalendarFilterSerializer,
+    BookingSerializer,
+    AllocationSerializer,
+    ReservationTicketsSerializer,
+    ReservationHistorySerializer,
+    SeatHoldSerializer,
+    ScheduleImportSerializer,
+    ReservationExportFilterSerializer,
+    TicketExportFilterSerializer,
+)
+from theatre_booking.performance_calendar import performance_calendar
+from theatre_booking.pagination import (
+    IdCursorPagination,
+    PerformanceCursorPagination,
+    ReservationCursorPagination,
 )
+from theatre_booking.streaming import ExportMixin, StreamingListMixin
+from theatre_booking.search import order_by_ids, search_play_ids
+from theatre_booking.seat_map import get_seat_map
+from theatre_service.replicas import PinPrimaryMixin, ReplicaReadMixin
+from theatre_service.transactions import contended_write
+
+
+def with_availability(queryset):
+    return queryset.annotate(
+        capacity=F("theatre_hall__rows") * F("theatre_hall__seats_in_row"),
+        available_seats=F("seats_left"),
+    )
 
 
-class ActorViewSet(viewsets.ModelViewSet):
+def performance_filter_lookups(filters):
+    lookups = {name: value for name, value in filters.items() if value is not None}
+    available = lookups.pop("available", None)
+    if available is not None:
+        lookups["seats_left__gt" if available else "seats_left__lte"] = 0
+    if "min_seats" in lookups:
+        lookups["seats_left__gte"] = lookups.pop("min_seats")
+    return lookups
+
+
+class ActorViewSet(ReplicaReadMixin, CatalogCacheMixin, viewsets.ModelViewSet):
     queryset = Actor.objects.all()
     serializer_class = ActorSerializer
+    cache_models = (Actor,)
 
     @extend_schema(
         description="List all actors",
@@ -68,43 +133,205 @@ class ActorViewSet(viewsets.ModelViewSet):
         return super().destroy(request, *args, **kwargs)
 
 
-class GenreViewSet(viewsets.ModelViewSet):
+class GenreViewSet(ReplicaReadMixin, CatalogCacheMixin, viewsets.ModelViewSet):
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
+    cache_models = (Genre,)
 
 
-class ReservationViewSet(viewsets.ModelViewSet):
+class ReservationViewSet(
+    PinPrimaryMixin, ExportMixin, StreamingListMixin, viewsets.ModelViewSet
+):
     queryset = Reservation.objects.all()
     serializer_class = ReservationSerializer
+    pagination_class = ReservationCursorPagination
+    # Set per action to pick a budget from DEFAULT_THROTTLE_RATES
+    throttle_scope = None
+    export_filter_serializer_class = ReservationExportFilterSerializer
+    export_fields = {
+        "reservation_id": "id",
+        "created_at": "created_at",
+        "user_id": "user_id",
+        "username": "user__username",
+        "status": "status",
+        "tickets": "ticket_count",
+    }
+
+    def get_export_queryset(self, filters):
+        return (
+            super().get_export_queryset(filters).annotate(ticket_count=Count("tickets"))
+        )
+
+    def get_queryset(self):
+        queryset = self.queryset
+        if self.action in ("confirm", "cancel"):
+            queryset = queryset.filter(user=self.request.user)
+        if self.action == "mine":
+            tickets = Ticket.objects.select_related(
+                "performance__play", "performance__theatre_hall"
+            ).order_by("id")
+            queryset = queryset.filter(user=self.request.user).prefetch_related(
+                Prefetch("tickets", queryset=tickets)
+            )
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == "book":
+            return BookingSerializer
+        if self.action == "allocate":
+            return AllocationSerializer
+        if self.action == "mine":
+            return ReservationHistorySerializer
+        return self.serializer_class
+
+    @extend_schema(
+        description="Reservations of the current user, newest first, with their "
+        "tickets"
+    )
+    @action(detail=False, permission_classes=[IsAuthenticated])
+    def mine(self, request):
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def transition(self, new_status):
+        try:
+            reservation = change_status(self.get_object(), new_status)
+        except InvalidTransition as error:
+            return Response({"detail": str(error)}, status=status.HTTP_409_CONFLICT)
+        return Response(ReservationSerializer(reservation).data)
+
+    @extend_schema(
+        request=None,
+        responses=ReservationSerializer,
+        description="Confirm a cart that still has tickets and has not expired",
+    )
+    @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
+    def confirm(self, request, pk=None):
+        return self.transition(Reservation.Status.CONFIRMED)
+
+    @extend_schema(
+        request=None,
+        responses=ReservationSerializer,
+        description="Cancel a cart or confirmed reservation, freeing its seats",
+    )
+    @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
+    def cancel(self, request, pk=None):
+        return self.transition(Reservation.Status.CANCELLED)
+
+    @extend_schema(
+        description="Book several seats of one performance in a single reservation",
+        responses=ReservationTicketsSerializer,
+    )
+    @action(
+        detail=False,
+        methods=["post"],
+        permission_classes=[IsAuthenticated],
+        throttle_scope="booking",
+    )
+    def book(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            reservation = serializer.save(user=request.user)
+        except SeatsUnavailable as error:
+            conflicts = [{"row": row, "seat": seat} for row, seat in error.seats]
+            return Response({"conflicts": conflicts}, status=status.HTTP_409_CONFLICT)
+        return Response(
+            ReservationTicketsSerializer(reservation).data,
+            status=status.HTTP_201_CREATED,
+        )
 
+    @extend_schema(
+        description="Book the best free seats of a performance, together in one "
+        "row where possible, otherwise split over two adjacent rows",
+        responses=ReservationTicketsSerializer,
+    )
+    @action(
+        detail=False,
+        methods=["post"],
+        permission_classes=[IsAuthenticated],
+        throttle_scope="booking",
+    )
+    def allocate(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            reservation = serializer.save(user=request.user)
+        except NoAdjacentSeats as error:
+            return Response({"detail": str(error)}, status=status.HTTP_409_CONFLICT)
+        except SeatsUnavailable as error:
+            conflicts = [{"row": row, "seat": seat} for row, seat in error.seats]
+            return Response({"conflicts": conflicts}, status=status.HTTP_409_CONFLICT)
+        return Response(
+            ReservationTicketsSerializer(reservation).data,
+            status=status.HTTP_201_CREATED,
+        )
 
-class TheatreHallViewSet(viewsets.ModelViewSet):
+
+class TheatreHallViewSet(ReplicaReadMixin, CatalogCacheMixin, viewsets.ModelViewSet):
     queryset = TheatreHall.objects.all()
     serializer_class = TheatreHallSerializer
+    cache_models = (TheatreHall,)
 
 
-class PlayViewSet(viewsets.ModelViewSet):
+class PlayViewSet(
+    ReplicaReadMixin, CatalogCacheMixin, StreamingListMixin, viewsets.ModelViewSet
+):
     queryset = Play.objects.all()
     serializer_class = PlaySerializer
+    pagination_class = IdCursorPagination
+    cache_models = (Play, Actor, Genre)
 
     def get_serializer_class(self):
-        if self.action == "list":
+        if self.action in ("list", "stream"):
             return PlayListSerializer
         return self.serializer_class
 
     def get_queryset(self):
         queryset = self.queryset
-        if self.action == "list":
+        if self.action in ("list", "stream"):
             queryset = queryset.prefetch_related("actors", "genres")
+        if self.action == "list" and self.search_query:
+            ids = search_play_ids(self.search_query, settings.PLAY_SEARCH_LIMIT)
+            queryset = order_by_ids(queryset, ids)
         return queryset
 
+    @property
+    def search_query(self):
+        return self.request.query_params.get("search", "").strip()
+
+    def paginate_queryset(self, queryset):
+        # Search results are ranked by relevance and capped, not paginated.
+        if self.action == "list" and self.search_query:
+            return None
+        return super().paginate_queryset(queryset)
+
+    @extend_schema(
+        description="List plays",
+        parameters=[
+            OpenApiParameter(
+                name="search",
+                type=str,
+                description=(
+                    "Words to match in title, description, actor and genre "
+                    "names; results are ranked by relevance"
+                ),
+            ),
+        ],
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
-class PerformanceViewSet(viewsets.ModelViewSet):
+
+class PerformanceViewSet(ReplicaReadMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = Performance.objects.all()
     serializer_class = PerformanceSerializer
+    pagination_class = PerformanceCursorPagination
+    throttle_scope = None
 
     def get_serializer_class(self):
-        if self.action == "list":
+        if self.action in ("list", "stream"):
             return PerformanceListSerializer
         if self.action == "retrieve":
             return PerformanceDetailSerializer
@@ -112,28 +339,225 @@ class PerformanceViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         queryset = self.queryset
-        if self.action == "list":
-            queryset = queryset.select_related("play")
+        if self.action in ("list", "retrieve", "stream"):
+            queryset = with_availability(queryset)
+        if self.action in ("list", "stream"):
+            queryset = queryset.select_related("play").prefetch_related(
+                "play__actors", "play__genres"
+            )
+        if self.action == "retrieve":
+            queryset = queryset.select_related("theatre_hall")
+        if self.action in ("seats", "holds"):
+            queryset = queryset.select_related("theatre_hall")
         return queryset
 
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action not in ("list", "stream"):
+            return queryset
+
+        filters = PerformanceFilterSerializer(data=self.request.query_params)
+        filters.is_valid(raise_exception=True)
+        lookups = performance_filter_lookups(filters.validated_data)
+        if self.action == "list" and not (
+            "showtime__gte" in lookups or "showtime__lte" in lookups
+        ):
+            lookups["showtime__gte"] = timezone.now()
+        return queryset.filter(**lookups)
 
-class TicketViewSet(viewsets.ModelViewSet):
+    @extend_schema(
+        description="List performances, by default only upcoming ones",
+        parameters=[
+            OpenApiParameter(
+                name="showtime__gte",
+                type=OpenApiTypes.DATETIME,
+                description="Only performances starting at or after this time",
+            ),
+            OpenApiParameter(
+                name="showtime__lte",
+                type=OpenApiTypes.DATETIME,
+                description="Only performances starting at or before this time",
+            ),
+            OpenApiParameter(name="play", type=int, description="Filter by play id"),
+            OpenApiParameter(
+                name="theatre_hall", type=int, description="Filter by theatre hall id"
+            ),
+            OpenApiParameter(
+                name="play__genres", type=int, description="Filter by genre id"
+            ),
+            OpenApiParameter(
+                name="available",
+                type=bool,
+                description="Only performances with (true) or without (false) "
+                "free seats",
+            ),
+            OpenApiParameter(
+                name="min_seats",
+                type=int,
+                description="Only performances with at least this many free seats",
+            ),
+        ],
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @extend_schema(
+        description=(
+            "Number of performances and seats left per day, by default for "
+            f"the next {settings.PERFORMANCE_CALENDAR['DAYS']} days; with "
+            "group_by, per theatre hall or genre of each day"
+        ),
+        parameters=[
+            OpenApiParameter(
+                name="start",
+                type=OpenApiTypes.DATE,
+                description="First day, today by default",
+            ),
+            OpenApiParameter(name="days", type=int, description="Number of days"),
+            OpenApiParameter(
+                name="group_by",
+                type=str,
+                enum=("hall", "genre"),
+                description="Split each day by theatre hall or by genre",
+            ),
+        ],
+    )
+    @action(detail=False, methods=["get"])
+    def calendar(self, request):
+        filters = CalendarFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        start = filters.validated_data["start"]
+        days = filters.validated_data["days"]
+        group_by = filters.validated_data.get("group_by")
+        return Response(
+            {
+                "start": start,
+                "days": days,
+                "group_by": group_by,
+                "results": performance_calendar(start, days, group_by),
+            }
+        )
+
+    @extend_schema(description="Seat availability bitmap of a performance")
+    @action(detail=True, methods=["get"])
+    def seats(self, request, pk=None):
+        performance = self.get_object()
+        return Response(get_seat_map(performance).to_representation())
+
+    @extend_schema(
+        description=(
+            "Hold seats during checkout (POST), extend the user's holds (PATCH) "
+            "or release them (DELETE, all holds when no tickets are given)"
+        ),
+        request=SeatHoldSerializer,
+        responses=SeatHoldSerializer,
+    )
+    @action(
+        detail=True,
+        methods=["post", "patch", "delete"],
+        permission_classes=[IsAuthenticated],
+        throttle_scope="booking",
+    )
+    def holds(self, request, pk=None):
+        performance = self.get_object()
+        if request.method == "DELETE" and not request.data:
+            release_holds(request.user, performance)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        serializer = SeatHoldSerializer(
+            data=request.data, context={"performance": performance}
+        )
+        serializer.is_valid(raise_exception=True)
+        seats = serializer.validated_data["seats"]
+
+        if request.method == "DELETE":
+            release_holds(request.user, performance, seats)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        if request.method == "PATCH":
+            seats, expires_at = extend_holds(request.user, performance, seats)
+        else:
+            try:
+                expires_at = hold_seats(request.user, performance, seats)
+            except SeatsUnavailable as error:
+                conflicts = [{"row": row, "seat": seat} for row, seat in error.seats]
+                return Response(
+                    {"conflicts": conflicts}, status=status.HTTP_409_CONFLICT
+                )
+
+        tickets = [{"row": row, "seat": seat} for row, seat in seats]
+        return Response({"tickets": tickets, "expires_at": expires_at})
+
+
+class TicketViewSet(
+    PinPrimaryMixin, ExportMixin, StreamingListMixin, viewsets.ModelViewSet
+):
     queryset = Ticket.objects.all()
     serializer_class = TicketSerializer
+    pagination_class = IdCursorPagination
+    export_filter_serializer_class = TicketExportFilterSerializer
+    export_filter_lookups = {
+        "play": "performance__play",
+        "showtime__gte": "performance__showtime__gte",
+        "showtime__lte": "performance__showtime__lte",
+    }
+    export_fields = {
+        "ticket_id": "id",
+        "row": "row",
+        "seat": "seat",
+        "performance_id": "performance_id",
+        "showtime": "performance__showtime",
+        "play": "performance__play__title",
+        "theatre_hall": "performance__theatre_hall__name",
+        "reservation_id": "reservation_id",
+        "reserved_at": "reservation__created_at",
+        "user_id": "reservation__user_id",
+        "username": "reservation__user__username",
+    }
 
     def get_queryset(self):
         return self.queryset.filter(reservation__user=self.request.user)
 
+    def get_permissions(self):
+        if self.action == "create":
+            # Customers add tickets to their own cart.
+            return [IsAuthenticated()]
+        return super().get_permissions()
+
+    def save_ticket(self, serializer, **kwargs):
+        # A seat sold after validation fails the unique constraint on save.
+        try:
+            serializer.save(**kwargs)
+        except DjangoValidationError:
+            raise ValidationError({"seat": ["Seat is already taken"]})
+
+    @contended_write
     def perform_create(self, serializer):
-        user = self.request.user
-        current_reservation = Reservation.objects.filter(
-            user=user, status="active"
-        ).first()
-        if current_reservation:
-            serializer.save(reservation=current_reservation)
-        else:
-            new_reservation = Reservation.objects.create(user=user, status="active")
-            serializer.save(reservation=new_reservation)
+        with transaction.atomic():
+            self.save_ticket(serializer, reservation=get_cart(self.request.user))
 
+    @contended_write
     def perform_update(self, serializer):
-        serializer.save()
+        self.save_ticket(serializer)
+
+
+class ScheduleImportView(APIView):
+    """Staff upload of a season schedule in the ``import_schedule`` format.
+
+    Large uploads are spooled to disk by Django and read line by line, so
+    memory stays flat whatever the file size.
+    """
+
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser]
+    serializer_class = ScheduleImportSerializer
+
+    @extend_schema(request={"multipart/form-data": ScheduleImportSerializer})
+    def post(self, request):
+        serializer = ScheduleImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.validated_data["file"]
+        lines = io.TextIOWrapper(upload.file, encoding="utf-8", newline="")
+        report = import_schedule(lines, serializer.validated_data["file_format"])
+        # Valid rows are committed even when others fail, so the report is
+        # returned as a success listing the rejected rows.
+        return Response(report.to_representation())
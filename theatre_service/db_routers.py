@@ -0,0 +1,30 @@
+import random
+
+from django.conf import settings
+
+from theatre_service.replicas import read_from_replica
+
+
+class ReplicaRouter:
+    """Send reads to a random replica while ``read_from_replica`` is set.
+
+    Every write goes to the primary, including saves of rows that were
+    read from a replica. Replicas are copies of the primary, so relations
+    across them are allowed, and they are never migrated themselves.
+    """
+
+    def db_for_read(self, model, **hints):
+        if settings.READ_REPLICAS and read_from_replica.get():
+            return random.choice(settings.READ_REPLICAS)
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.READ_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,195 @@
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger("theatre_service.performance")
+
+
+class QueryRecorder:
+    """``execute_wrapper`` hook counting queries and their total duration.
+
+    Only the slowest statement is kept unless ``capture`` is set, in which
+    case every statement and its duration is recorded too.
+    """
+
+    def __init__(self, capture=False):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest_duration = 0.0
+        self.slowest_sql = None
+        self.statements = [] if capture else None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            if elapsed > self.slowest_duration:
+                self.slowest_duration = elapsed
+                self.slowest_sql = sql
+            if self.statements is not None:
+                self.statements.append((round(elapsed * 1000, 3), sql))
+
+    def start_capture(self):
+        if self.statements is None:
+            self.statements = []
+
+
+def capture_staff_sql(request, user):
+    """Capture the rest of a request's SQL once its user is known as staff.
+
+    API users are authenticated by DRF inside the view, after the
+    middleware decided on capture from the session user.
+    """
+    recorder = getattr(request, "timing_recorder", None)
+    if recorder is not None and user is not None and user.is_staff:
+        recorder.start_capture()
+
+
+class ServerTimingMiddleware:
+    """Report per-request DB and view timings in a ``Server-Timing`` header.
+
+    Counters are always on; full SQL capture is limited to staff users and
+    a sampled fraction of requests. Requests over a budget configured
+    in ``REQUEST_INSTRUMENTATION["BUDGETS"]`` for their route are logged.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.REQUEST_INSTRUMENTATION.get("ENABLED", True):
+            return self.get_response(request)
+
+        recorder = self.start(request, getattr(request, "user", None))
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            self.install(stack, recorder)
+            response = self.get_response(request)
+        return self.finish(request, response, recorder, started)
+
+    async def __acall__(self, request):
+        if not settings.REQUEST_INSTRUMENTATION.get("ENABLED", True):
+            return await self.get_response(request)
+
+        auser = getattr(request, "auser", None)
+        recorder = self.start(request, await auser() if auser else None)
+        started = time.perf_counter()
+        # Async views run their queries in the request's sync thread, whose
+        # connections are not the ones visible from the event loop.
+        stack = ExitStack()
+        await sync_to_async(self.install)(stack, recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.finish(request, response, recorder, started)
+
+    def start(self, request, user):
+        config = settings.REQUEST_INSTRUMENTATION
+        sampled = random.random() < config.get("SQL_CAPTURE_SAMPLE_RATE", 0)
+        request.timing_view_started = request.timing_view_finished = None
+        recorder = QueryRecorder(capture=sampled)
+        request.timing_recorder = recorder
+        capture_staff_sql(request, user)
+        return recorder
+
+    @staticmethod
+    def install(stack, recorder):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+
+    def finish(self, request, response, recorder, started):
+        finished = time.perf_counter()
+        timings = self.timings(request, recorder, started, finished)
+        response["Server-Timing"] = ", ".join(
+            f"{name};dur={duration:.3f}" + (f';desc="{desc}"' if desc else "")
+            for name, duration, desc in timings
+        )
+        durations = {name: duration for name, duration, _ in timings}
+        self.check_budget(request, recorder, durations)
+        if recorder.statements is not None:
+            logger.info(
+                "Request SQL",
+                extra={
+                    "path": request.path,
+                    "route": self.route(request),
+                    "statements": recorder.statements,
+                },
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.timing_view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after this hook, so the remaining time
+        # up to the end of the request is rendering.
+        request.timing_view_finished = time.perf_counter()
+        return response
+
+    @staticmethod
+    def route(request):
+        match = getattr(request, "resolver_match", None)
+        return match.view_name if match else None
+
+    @staticmethod
+    def timings(request, recorder, started, finished):
+        db = recorder.duration * 1000
+        timings = [
+            ("db", db, f"{recorder.count} queries"),
+            ("db-slowest", recorder.slowest_duration * 1000, None),
+        ]
+        view_started = request.timing_view_started
+        if view_started is not None:
+            view_finished = request.timing_view_finished or finished
+            view = (view_finished - view_started) * 1000
+            timings.append(("view", view, None))
+            # View time outside the database: permission checks, business
+            # logic and serialization.
+            timings.append(("app", max(view - db, 0.0), None))
+            if request.timing_view_finished is not None:
+                timings.append(("render", (finished - view_finished) * 1000, None))
+        timings.append(("total", (finished - started) * 1000, None))
+        return timings
+
+    def check_budget(self, request, recorder, durations):
+        route = self.route(request)
+        budget = settings.REQUEST_INSTRUMENTATION.get("BUDGETS", {}).get(route)
+        if not budget:
+            return
+        exceeded = []
+        if "queries" in budget and recorder.count > budget["queries"]:
+            exceeded.append("queries")
+        if "db_ms" in budget and durations["db"] > budget["db_ms"]:
+            exceeded.append("db_ms")
+        if "total_ms" in budget and durations["total"] > budget["total_ms"]:
+            exceeded.append("total_ms")
+        if exceeded:
+            logger.warning(
+                "Request over budget",
+                extra={
+                    "route": route,
+                    "path": request.path,
+                    "exceeded": exceeded,
+                    "queries": recorder.count,
+                    "db_ms": round(durations["db"], 3),
+                    "total_ms": round(durations["total"], 3),
+                    "slowest_sql": recorder.slowest_sql,
+                },
+            )
@@ -0,0 +1,88 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+# Set while a request may read from the replicas in READ_REPLICAS
+read_from_replica = ContextVar("read_from_replica", default=False)
+
+
+@contextmanager
+def use_replica(enabled=True):
+    token = read_from_replica.set(enabled)
+    try:
+        yield
+    finally:
+        read_from_replica.reset(token)
+
+
+def pin_key(name):
+    return f"replica-pin:{name}"
+
+
+def user_pin(user):
+    return f"user:{user.pk}"
+
+
+def model_pin(model):
+    return f"model:{model._meta.label_lower}"
+
+
+def pin_primary(*names):
+    """Read from the primary for a while wherever ``names`` are checked.
+
+    The pin lasts ``REPLICA_PIN_TIMEOUT`` seconds, which must cover the
+    replicas' lag behind the primary.
+    """
+    cache.set_many(
+        {pin_key(name): True for name in names}, settings.REPLICA_PIN_TIMEOUT
+    )
+
+
+def is_pinned(*names):
+    return bool(names) and bool(cache.get_many([pin_key(name) for name in names]))
+
+
+class ReplicaReadMixin:
+    """Serve safe-method requests of a viewset from a read replica.
+
+    Authentication, permissions and throttles still read the primary. A
+    user who wrote through a ``PinPrimaryMixin`` view shortly before keeps
+    reading from the primary, so they see their own changes.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with use_replica(False):
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and not is_pinned(
+            *self.get_primary_pins(request)
+        ):
+            read_from_replica.set(True)
+
+    def get_primary_pins(self, request):
+        # A cached catalog response must not be rebuilt from a replica that
+        # has not caught up with the change that invalidated it.
+        pins = [model_pin(model) for model in getattr(self, "cache_models", ())]
+        if request.user and request.user.is_authenticated:
+            pins.append(user_pin(request.user))
+        return pins
+
+
+class PinPrimaryMixin:
+    """Pin the user to the primary after a successful unsafe request."""
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if (
+            request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and request.user
+            and request.user.is_authenticated
+        ):
+            pin_primary(user_pin(request.user))
+        return response
@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/5.0/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
+import os
 from datetime import timedelta
 from pathlib import Path
 
@@ -48,6 +49,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "theatre_service.middleware.ServerTimingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -75,13 +77,56 @@ WSGI_APPLICATION = "theatre_service.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# The SQLite backend in theatre_service.sqlite_backend sets these pragmas on
+# every connection: WAL lets readers run alongside the one writer, NORMAL
+# sync is durable with WAL except for the last commits on power loss, and
+# busy_timeout is how long a writer waits for the lock.
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
+        "ENGINE": "theatre_service.sqlite_backend",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            "pragmas": {
+                "journal_mode": "WAL",
+                "synchronous": "NORMAL",
+                "busy_timeout": 5000,
+                "mmap_size": 256 * 1024 * 1024,
+                "cache_size": -64 * 1024,
+            },
+        },
     }
 }
 
+# Write paths wrapped in transactions.contended_write are retried this many
+# times in all when the database is locked, sleeping a random time of up to
+# DELAY * 2 ** attempt seconds, capped at MAX_DELAY, in between.
+DATABASE_LOCK_RETRY = {
+    "ATTEMPTS": 5,
+    "DELAY": 0.02,
+    "MAX_DELAY": 0.5,
+}
+
+# Read replicas for catalog and performance listings, from a comma separated
+# list of SQLite files in DATABASE_REPLICAS kept in sync with the primary by
+# the sync_replicas command. Tests read the primary through them.
+READ_REPLICAS = []
+for index, name in enumerate(
+    filter(None, os.environ.get("DATABASE_REPLICAS", "").split(","))
+):
+    alias = f"replica_{index}"
+    DATABASES[alias] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": name.strip(),
+        "TEST": {"MIRROR": "default"},
+    }
+    READ_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["theatre_service.db_routers.ReplicaRouter"]
+
+# Seconds a user keeps reading from the primary after a booking, and a
+# catalog model after a change; must cover the replicas' lag
+REPLICA_PIN_TIMEOUT = 10
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -100,6 +145,24 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at a file based
+# or shared backend when running several workers.
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+    }
+}
+
+CATALOG_CACHE_ALIAS = "default"
+
+CATALOG_CACHE_TIMEOUT = 60 * 60
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
 
@@ -123,20 +186,33 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_RENDERER_CLASSES": (
+        "theatre_service.renderers.OrjsonRenderer",
+        "theatre_service.renderers.MessagePackRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "theatre_service.parsers.OrjsonParser",
+        "theatre_service.parsers.MessagePackParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "user.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle"
+        "theatre_service.throttling.SlidingWindowAnonRateThrottle",
+        "theatre_service.throttling.SlidingWindowUserRateThrottle",
+        "theatre_service.throttling.SlidingWindowScopedRateThrottle",
     ],
     "DEFAULT_THROTTLE_RATES": {
         "anon": "100/day",
-        "user": "1000/day"
+        "user": "1000/day",
+        "booking": "30/minute",
     },
     "DEFAULT_PERMISSION_CLASSES": [
         "user.permissions.IsAdminOrIfAuthenticatedReadOnly"
-    ]
+    ],
 }
 
 SIMPLE_JWT = {
@@ -144,3 +220,68 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
     "ROTATE_REFRESH_TOKENS": True
 }
+
+# Seconds a performance seat map stays cached between ticket changes
+SEAT_MAP_CACHE_TIMEOUT = 5 * 60
+
+# How long a seat stays held for a customer during checkout
+SEAT_HOLD_TTL = timedelta(minutes=5)
+
+# How long a ticket cart may go without new tickets before it expires
+RESERVATION_CART_TTL = timedelta(minutes=15)
+
+# Most seats one booking or seat hold request may ask for
+BOOKING_MAX_SEATS = 10
+
+# Best-available seat allocation. Blocks of seats are scored by distance from
+# the centre of the row and from IDEAL_ROW (0 = front row, 1 = back row),
+# weighted by CENTRE_WEIGHT and ROW_WEIGHT; lower is better. MAX_SEATS caps
+# the seats of one request.
+SEAT_ALLOCATION = {
+    "CENTRE_WEIGHT": 1.0,
+    "ROW_WEIGHT": 1.0,
+    "IDEAL_ROW": 0.3,
+    "MAX_SEATS": 10,
+}
+
+# Performance calendar: default and maximum number of days of a request, how
+# many days from today they may reach either way, and seconds a day's
+# aggregates stay cached unless one of its shows changes
+PERFORMANCE_CALENDAR = {
+    "DAYS": 90,
+    "MAX_DAYS": 366,
+    "HORIZON_DAYS": 5 * 366,
+    "CACHE_TIMEOUT": 24 * 60 * 60,
+}
+
+# Maximum number of plays returned by a ?search= query
+PLAY_SEARCH_LIMIT = 50
+
+# Per-request query/timing counters reported in the Server-Timing header.
+# Full SQL is captured for staff sessions and a sampled fraction of requests;
+# BUDGETS maps route names to limits on "queries", "db_ms" and "total_ms".
+REQUEST_INSTRUMENTATION = {
+    "ENABLED": True,
+    "SQL_CAPTURE_SAMPLE_RATE": 0.01,
+    "BUDGETS": {
+        "theatre_booking:performance-list": {"queries": 5, "total_ms": 250},
+        "theatre_booking:performance-detail": {"queries": 3, "total_ms": 100},
+        "theatre_booking:performance-seats": {"queries": 3, "total_ms": 50},
+        "theatre_booking:performance-calendar": {"queries": 1, "total_ms": 100},
+        "theatre_booking:play-list": {"queries": 5, "total_ms": 250},
+        "theatre_booking:reservation-book": {"queries": 10, "total_ms": 250},
+    },
+}
+
+# Server-Sent Events of seat changes. BACKEND is LocalBackend for a single
+# process or CacheBackend to relay events between workers via the cache.
+SEAT_EVENTS = {
+    "BACKEND": "theatre_booking.events.LocalBackend",
+    "SNAPSHOT_INTERVAL": 30,
+    "POLL_INTERVAL": 0.5,
+    "QUEUE_SIZE": 100,
+    "EVENT_TIMEOUT": 60,
+}
+
+# Seconds the fields CachedJWTAuthentication needs are cached per user
+AUTH_USER_CACHE_TIMEOUT = 60
@@ -0,0 +1,38 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+from theatre_service.transactions import transaction_mode
+
+TRANSACTION_MODES = ("DEFERRED", "IMMEDIATE", "EXCLUSIVE")
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite backend for many concurrent writers.
+
+    Two ``OPTIONS`` keys are added to the stock backend's:
+
+    * ``pragmas`` maps PRAGMA names to values set on every new connection.
+    * ``transaction_mode`` is the mode of the BEGIN that starts atomic
+      blocks, ``DEFERRED`` by default. ``transactions.contended_write``
+      switches a single write path to ``IMMEDIATE``.
+    """
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop("pragmas", None)
+        params.pop("transaction_mode", None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict["OPTIONS"].get("pragmas", {}).items():
+            connection.execute(f"PRAGMA {name} = {value}")
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        mode = transaction_mode.get() or self.settings_dict["OPTIONS"].get(
+            "transaction_mode", "DEFERRED"
+        )
+        if mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(f"Unknown SQLite transaction mode {mode!r}")
+        self.cursor().execute(f"BEGIN {mode}")
@@ -0,0 +1,75 @@
+from rest_framework.throttling import (
+    AnonRateThrottle,
+    ScopedRateThrottle,
+    SimpleRateThrottle,
+    UserRateThrottle,
+)
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    """``SimpleRateThrottle`` on a sliding-window counter.
+
+    Instead of a list of request timestamps, each key has one integer
+    counter per fixed window. The request rate is estimated as the current
+    window's count plus the previous window's count weighted by how much of
+    it still overlaps the sliding window. The state is two integers per key
+    whatever the rate, and counters are updated with atomic ``incr``.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window, elapsed = divmod(self.now, self.duration)
+        current_key = f"{self.key}:{int(window)}"
+        # A window's counter is read during the next window as well.
+        self.cache.add(current_key, 0, self.duration * 2)
+        try:
+            self.current = self.cache.incr(current_key)
+        except ValueError:
+            # Evicted between add() and incr().
+            self.cache.set(current_key, 1, self.duration * 2)
+            self.current = 1
+        self.previous = self.cache.get(f"{self.key}:{int(window) - 1}", 0)
+        self.elapsed = elapsed
+
+        if self.estimate() > self.num_requests:
+            # Rejected requests do not count against the budget.
+            try:
+                self.cache.decr(current_key)
+            except ValueError:
+                pass
+            self.current -= 1
+            return self.throttle_failure()
+        return True
+
+    def estimate(self):
+        return self.previous * (1 - self.elapsed / self.duration) + self.current
+
+    def wait(self):
+        remaining = self.duration - self.elapsed
+        if self.current >= self.num_requests:
+            # Nothing is allowed until the next window starts, and then the
+            # whole current count carries over as the previous window.
+            carried = self.current - (self.num_requests - 1)
+            return remaining + self.duration * carried / self.current
+        # Wait for the previous window's weight to leave room for one more.
+        allowed = (self.num_requests - 1 - self.current) / self.previous
+        return max(self.duration * (1 - allowed) - self.elapsed, 0.0)
+
+
+class SlidingWindowAnonRateThrottle(AnonRateThrottle, SlidingWindowRateThrottle):
+    pass
+
+
+class SlidingWindowUserRateThrottle(UserRateThrottle, SlidingWindowRateThrottle):
+    pass
+
+
+class SlidingWindowScopedRateThrottle(ScopedRateThrottle, SlidingWindowRateThrottle):
+    """Per-endpoint budgets named by the view's or action's ``throttle_scope``."""
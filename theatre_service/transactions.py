@@ -0,0 +1,73 @@
+import random
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, connection
+
+# BEGIN mode of transactions started while set, read by the SQLite backend
+transaction_mode = ContextVar("transaction_mode", default=None)
+
+# Queues this process's contended writes to SQLite
+write_gate = threading.Lock()
+
+
+@contextmanager
+def use_transaction_mode(mode):
+    token = transaction_mode.set(mode)
+    try:
+        yield
+    finally:
+        transaction_mode.reset(token)
+
+
+def is_lock_error(error):
+    message = str(error)
+    return "database is locked" in message or "database table is locked" in message
+
+
+def lock_retry_delays():
+    """Sleeps between attempts: exponential backoff with full jitter."""
+    options = settings.DATABASE_LOCK_RETRY
+    for attempt in range(options["ATTEMPTS"] - 1):
+        yield random.uniform(
+            0, min(options["MAX_DELAY"], options["DELAY"] * 2**attempt)
+        )
+
+
+def contended_write(func):
+    """Run a write path in IMMEDIATE transactions, retrying it while locked.
+
+    SQLite reports a lock it did not get within ``busy_timeout``, or one a
+    deferred transaction could never get, as ``database is locked``. The
+    whole call is retried up to ``DATABASE_LOCK_RETRY["ATTEMPTS"]`` times
+    with a random delay, so it must not have side effects outside the
+    database before it fails. Calls inside an outer atomic block or another
+    ``contended_write`` call run once, within the outer call's retries.
+
+    On SQLite, calls from one process also queue on ``write_gate``. The
+    busy handler sleeps longer and longer between polls of the lock and
+    lets newcomers overtake writers that have waited for seconds, so only
+    writers of other processes are left to it.
+    """
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if connection.in_atomic_block or transaction_mode.get() == "IMMEDIATE":
+            return func(*args, **kwargs)
+        delays = lock_retry_delays()
+        while True:
+            gate = write_gate if connection.vendor == "sqlite" else nullcontext()
+            try:
+                with gate, use_transaction_mode("IMMEDIATE"):
+                    return func(*args, **kwargs)
+            except OperationalError as error:
+                delay = next(delays, None)
+                if delay is None or not is_lock_error(error):
+                    raise
+            time.sleep(delay)
+
+    return wrapper
@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from theatre_service.middleware import capture_staff_sql
+
+# User fields needed by the permission classes and throttles
+CACHED_USER_FIELDS = ("username", "is_active", "is_staff", "is_superuser")
+
+
+def user_cache_key(user_id):
+    return f"auth-user:{user_id}"
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` that skips the user query on a cache hit.
+
+    The user is rebuilt from a short-lived cache entry as an instance with
+    only ``CACHED_USER_FIELDS`` loaded; other fields are deferred and load
+    on access, and ``save()`` only writes the loaded ones. Entries are
+    dropped whenever the user is saved or deleted.
+    """
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            # DRF passes its Request, which wraps the one the middleware saw.
+            capture_staff_sql(getattr(request, "_request", request), result[0])
+        return result
+
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # Revocation compares against the password hash, which is not
+            # kept in the cache.
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        key = user_cache_key(user_id)
+        values = cache.get(key)
+        if values is None:
+            user = super().get_user(validated_token)
+            values = [getattr(user, field) for field in CACHED_USER_FIELDS]
+            cache.set(key, values, settings.AUTH_USER_CACHE_TIMEOUT)
+            return user
+
+        loaded = dict(zip(CACHED_USER_FIELDS, values))
+        loaded[api_settings.USER_ID_FIELD] = user_id
+        # from_db() expects values in model field order.
+        fields = [
+            field.attname
+            for field in self.user_model._meta.concrete_fields
+            if field.attname in loaded
+        ]
+        user = self.user_model.from_db(
+            DEFAULT_DB_ALIAS, fields, [loaded[field] for field in fields]
+        )
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
@@ -0,0 +1,17 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.settings import api_settings
+
+from user.authentication import user_cache_key
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_cached_user(sender, instance, **kwargs):
+    key = user_cache_key(getattr(instance, api_settings.USER_ID_FIELD))
+    cache.delete(key)
+    # A concurrent request may have re-cached the old row before commit.
+    transaction.on_commit(lambda: cache.delete(key))
@@ -1,10 +1,13 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APIRequestFactory, APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from user.authentication import CachedJWTAuthentication, user_cache_key
+
 
 class AuthenticationTests(APITestCase):
     def setUp(self):
@@ -65,3 +68,39 @@ class ProfileManagementTests(APITestCase):
         response = self.client.patch(url, updated_data, format="json")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["username"], updated_data["username"])
+
+
+class CachedJWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username="test_user", password="test_password", is_staff=True
+        )
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        self.headers = {"Authorization": f"Bearer {self.token}"}
+        self.url = reverse("theatre_booking:performance-list")
+
+    def test_user_served_from_cache(self):
+        self.client.get(self.url, headers=self.headers)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        request = APIRequestFactory().get(self.url, headers=self.headers)
+        with self.assertNumQueries(0):
+            user, _ = CachedJWTAuthentication().authenticate(request)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertTrue(user.is_staff)
+
+    def test_cache_invalidated_on_profile_update(self):
+        self.client.get(self.url, headers=self.headers)
+        response = self.client.patch(
+            reverse("user:manage"), {"username": "renamed"}, headers=self.headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -19,6 +19,7 @@ class CreateTokenView(ObtainAuthToken):
 
 class ManageUserView(RetrieveUpdateAPIView):
     serializer_class = UserSerializer
+    # The profile is edited and saved, so load the full user row.
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated & IsAdminOrIfAuthenticatedReadOnly]
 